@@ -1 +1,10 @@
-from .dispatcher import dispatch
\ No newline at end of file
+from .dispatcher import dispatch
+import importlib
+
+# Subpackages are imported on first access, so the CLI only loads what a command needs
+_subpackages = {'core', 'io', 'utils', 'weather', 'soil', 'sites', 'gee', 'opc', 'phenocrop', 'workspace'}
+
+def __getattr__(name):
+    if name in _subpackages:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
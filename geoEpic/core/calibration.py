@@ -1,4 +1,9 @@
 import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
@@ -36,6 +41,8 @@ class PygmoProblem:
             lens.append(len(df.constraints()))
         self.bounds = np.array(cons)
         self.lens = np.cumsum(lens)
+        self.fidelity = None
+        self.cache = None
 
     def fitness(self, x):
         """
@@ -47,16 +54,172 @@ class PygmoProblem:
         Returns:
             float: The fitness value as determined by the workspace's fitness function.
         """
+        self._write_parameters(x, self.workspace.model.path)
+        self.workspace.model_pool.broadcast([f'{df.name}.DAT' for df in self.dfs])
+        select_str = self.fidelity.select_str() if self.fidelity is not None else None
+
+        # Look up previous evaluations of the same parameters
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(x, select_str, self.workspace.model.path, self.workspace.run_info)
+        fit = self.cache.get(key) if key else None
+
+        if fit is None:
+            # Execute the model and get the fitness value
+            fit = self.workspace.run(select_str, progress_bar = False)
+            if key: self.cache.put(key, x, fit)
+
+        if self.fidelity is not None:
+            self.fidelity.update([np.atleast_1d(fit)[0]])
+        return fit
+
+    def batch_fitness(self, dvs):
+        """
+        Evaluate the fitness of several solution vectors concurrently.
+
+        Each candidate gets its own copy of the model directory with its parameter files,
+        and the sites of all candidates are run through one shared worker pool.
+        Used by pygmo through a batch fitness evaluator (e.g. pg.member_bfe).
+
+        Args:
+            dvs (np.array): Decision vectors of all candidates, concatenated.
+
+        Returns:
+            np.array: Fitness vectors of all candidates, concatenated.
+        """
+        xs = np.reshape(dvs, (-1, len(self.bounds)))
+        model_paths = self._model_copies(len(xs))
+        for x, model_path in zip(xs, model_paths):
+            self._write_parameters(x, model_path)
+
+        if self.fidelity is not None and self.fidelity.successive_halving:
+            fits = self._successive_halving(model_paths)
+        else:
+            select_str = self.fidelity.select_str() if self.fidelity is not None else None
+            fits = self._run_candidates(xs, model_paths, select_str)
+
+        if self.fidelity is not None:
+            self.fidelity.update(fits[:, 0])
+        return fits.flatten()
+
+    def _run_candidates(self, xs, model_paths, select_str):
+        """
+        Run the candidates not found in the cache with `Workspace.run_batch`.
+
+        Returns:
+            np.array: Fitness vectors of the candidates, one row per candidate.
+        """
+        keys = [None] * len(xs)
+        if self.cache is not None:
+            keys = [self.cache.key(x, select_str, path, self.workspace.run_info) for x, path in zip(xs, model_paths)]
+        fits = [self.cache.get(key) if key else None for key in keys]
+
+        pending = [i for i, fit in enumerate(fits) if fit is None]
+        if pending:
+            results = self.workspace.run_batch([model_paths[i] for i in pending], select_str, progress_bar = False)
+            for i, fit in zip(pending, results):
+                fits[i] = np.atleast_1d(fit).astype(float)
+                if keys[i]: self.cache.put(keys[i], xs[i], fits[i])
+        return np.array(fits, dtype=float)
+
+    def set_cache(self, path = None, decimals = 6):
+        """
+        Store fitness evaluations in a persistent cache, so repeated parameter vectors are not run again.
+
+        Evaluations are keyed by the parameter vector rounded to `decimals`, the site selection
+        and the contents of the run info and model directory, including the written parameter files.
+        The cache is shared across sessions, so an interrupted calibration can reuse its history.
+
+        Args:
+            path (str, optional): Path to the sqlite cache file. Defaults to 'fitness_cache.db' in the workspace directory.
+            decimals (int): Number of decimals the parameter vector is rounded to.
+        """
+        if path is None:
+            path = os.path.join(self.workspace.base_dir, 'fitness_cache.db')
+        self.cache = FitnessCache(path, decimals)
+
+    def set_fidelity(self, levels = (0.1, 0.25, 0.5, 1.0), strata = None, tol = 0.01, 
+                     patience = 2, window = 20, successive_halving = False):
+        """
+        Evaluate fitness on a stratified subsample of the selected sites that grows as the optimiser converges.
+
+        Args:
+            levels (tuple): Increasing fractions of the selected sites to evaluate on.
+            strata (list, optional): Columns of run info to stratify on. Defaults to 'soil', 'dly' and 'opc'.
+            tol (float): Relative improvement of the best fitness below which a window counts as stalled.
+            patience (int): Number of stalled windows before moving to the next level.
+            window (int): Number of evaluations per window.
+            successive_halving (bool): In batch evaluations, run all candidates on the smallest level and
+                                       continue only the better half on each larger level up to the current one.
+        """
+        base_select = self.workspace.config["select"]
+        self.fidelity = FidelitySchedule(base_select, levels, strata, tol, patience, window, successive_halving)
+
+    def _successive_halving(self, model_paths):
+        """
+        Evaluate candidates on increasing site subsamples, discarding the worse half at each level.
+        Discarded candidates keep their last fitness, but never better than the worst finalist.
+        """
+        n = len(model_paths)
+        fits = np.full(n, np.nan)
+        alive = np.arange(n)
+        levels = self.fidelity.levels[:self.fidelity.level + 1]
+        for i, frac in enumerate(levels):
+            results = self.workspace.run_batch([model_paths[j] for j in alive], 
+                                               self.fidelity.select_str(frac), progress_bar = False)
+            results = np.array([np.atleast_1d(f) for f in results], dtype=float)
+            if results.shape[1] > 1:
+                raise ValueError("Successive halving supports single objective problems only.")
+            fits[alive] = results[:, 0]
+            if i < len(levels) - 1:
+                order = np.argsort(fits[alive], kind='stable')
+                alive = alive[order[:max(1, len(alive) // 2)]]
+        discarded = np.setdiff1d(np.arange(n), alive)
+        fits[discarded] = np.maximum(fits[discarded], np.nanmax(fits[alive]))
+        return fits[:, None]
+
+    def _write_parameters(self, x, path):
+        """
+        Edit the data frames with the solution vector 'x' and save them into 'path'.
+        """
         # Split the parameters according to self.lens, excluding the last cumulative length
         split_x = np.split(x, self.lens[:-1])
         
         # Update parameters in each dataframe and save
         for df, vals in zip(self.dfs, split_x):
             df.edit(vals)
-            df.save(self.workspace.model.path)
+            df.save(path)
 
-        # Execute the model and return the fitness value
-        return self.workspace.run(progress_bar = False)
+    def _model_copies(self, n):
+        """
+        Returns paths of 'n' copies of the model directory in the workspace cache.
+        Files changed or added in the model directory since the last call are copied into every copy.
+        """
+        src = self.workspace.model.path
+        copies_dir = os.path.join(self.workspace.cache, 'models')
+        source = {}
+        for root, _, files in os.walk(src):
+            for name in files:
+                if name == '.model_lock': continue
+                st = os.stat(os.path.join(root, name))
+                source[os.path.relpath(os.path.join(root, name), src)] = (st.st_size, st.st_mtime_ns)
+        paths = []
+        for i in range(n):
+            dst = os.path.join(copies_dir, str(i))
+            if not os.path.exists(dst):
+                shutil.copytree(src, dst, ignore=shutil.ignore_patterns('.model_lock'))
+            else:
+                # copy2 keeps the modification time, so unchanged files match the source
+                for rel, stat in source.items():
+                    path = os.path.join(dst, rel)
+                    try:
+                        st = os.stat(path)
+                        if (st.st_size, st.st_mtime_ns) == stat: continue
+                    except FileNotFoundError:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                    shutil.copy2(os.path.join(src, rel), path)
+            paths.append(dst)
+        return paths
     
     @property
     def current(self):
@@ -86,13 +249,21 @@ class PygmoProblem:
         return self.bounds[:, 0], self.bounds[:, 1]
     
 
-    def sensitivity_analysis(self, base_no_of_samples, method):
+    def sensitivity_analysis(self, base_no_of_samples, method, batch_size = None, checkpoint = None):
         """
         Perform sensitivity analysis using SALib with status updates.
 
+        Samples are evaluated in batches with `batch_fitness`, so each sample in a batch
+        runs on its own model copy and all sites of the batch share one worker pool.
+        If a checkpoint path is given, completed samples are saved to it after each batch, and
+        a killed job started again with the same checkpoint resumes from the remaining samples.
+        The checkpoint is removed once the analysis completes.
+
         Parameters:
         - base_no_of_samples (int): Base number of samples to generate.
         - method (str): Sensitivity analysis method ('sobol', 'efast', 'morris').
+        - batch_size (int, optional): Samples evaluated concurrently. Defaults to num_of_workers.
+        - checkpoint (str, optional): Path to the checkpoint (.npz) file. No checkpoint is kept by default.
 
         Returns:
         - dict: Results of the sensitivity analysis.
@@ -106,33 +277,58 @@ class PygmoProblem:
             "outputs": ["Y"]
         })
 
-        # Select the sampling and analysis method based on the method argument
-        if method == 'sobol':
-            print(f"Sampling using Sobol with {base_no_of_samples} samples...")
-            sp.sample_sobol(base_no_of_samples)
-        elif method == 'efast':
-            print(f"Sampling using eFAST with {base_no_of_samples} samples...")
-            sp.sample_fast(base_no_of_samples)
-        elif method == 'morris':
-            print(f"Sampling using Morris with {base_no_of_samples} samples...")
-            sp.sample_morris(base_no_of_samples)
+        batch_size = batch_size or self.workspace.config["num_of_workers"]
+        bounds = np.asarray(self.bounds, dtype=float)
+        names = np.array(self.var_names)
+
+        # Resume samples and outputs from checkpoint if present
+        if checkpoint is not None and os.path.exists(checkpoint):
+            saved = np.load(checkpoint)
+            mismatch = [key for key, same in [
+                ('method', str(saved['method']) == method),
+                ('base_no_of_samples', int(saved['base_no_of_samples']) == base_no_of_samples),
+                ('bounds', saved['bounds'].shape == bounds.shape and np.array_equal(saved['bounds'], bounds)),
+                ('names', saved['names'].shape == names.shape and (saved['names'] == names).all())] if not same]
+            if mismatch:
+                raise ValueError(f"Checkpoint {checkpoint} belongs to a different analysis "
+                                 f"(different {', '.join(mismatch)}). Remove it to start a new one.")
+            samples, outputs = saved['samples'], saved['outputs']
+            sp.set_samples(samples)
+            print(f"Resuming from {checkpoint}: {np.sum(~np.isnan(outputs))}/{len(outputs)} samples completed")
         else:
-            raise ValueError("Unsupported method. Choose from 'sobol', 'efast', or 'morris'.")
-
-        # Function to evaluate model outputs
-        def evaluate(samples):
-            print("Evaluating objective function for each sample...")
-            outputs = []
-            for i, sample in tqdm(enumerate(samples)):
-                output = self.fitness(sample)
-                if len(output) > 1:
-                    print('Warning: Choosing the first output')
-                outputs.append(output[0])
-            outputs = np.array(outputs)
-            return outputs
-
-        # Evaluate samples
-        sp.evaluate(evaluate)
+            # Select the sampling and analysis method based on the method argument
+            if method == 'sobol':
+                print(f"Sampling using Sobol with {base_no_of_samples} samples...")
+                sp.sample_sobol(base_no_of_samples)
+            elif method == 'efast':
+                print(f"Sampling using eFAST with {base_no_of_samples} samples...")
+                sp.sample_fast(base_no_of_samples)
+            elif method == 'morris':
+                print(f"Sampling using Morris with {base_no_of_samples} samples...")
+                sp.sample_morris(base_no_of_samples)
+            else:
+                raise ValueError("Unsupported method. Choose from 'sobol', 'efast', or 'morris'.")
+            samples = sp.samples
+            outputs = np.full(len(samples), np.nan)
+
+        # Evaluate pending samples in batches, saving progress after each batch
+        print("Evaluating objective function for each sample...")
+        pending = np.flatnonzero(np.isnan(outputs))
+        warned = False
+        for i in tqdm(range(0, len(pending), batch_size)):
+            inds = pending[i:i + batch_size]
+            fits = self.batch_fitness(samples[inds].flatten()).reshape(len(inds), -1)
+            if fits.shape[1] > 1 and not warned:
+                print('Warning: Choosing the first output')
+                warned = True
+            outputs[inds] = fits[:, 0]
+            if checkpoint is not None:
+                tmp_path = checkpoint + '.tmp.npz'
+                np.savez(tmp_path, method=method, base_no_of_samples=base_no_of_samples, bounds=bounds,
+                         names=names, samples=samples, outputs=outputs)
+                os.replace(tmp_path, checkpoint)
+
+        sp.set_results(outputs)
 
         # Perform sensitivity analysis
         print(f"Performing sensitivity analysis using {method}...")
@@ -143,6 +339,8 @@ class PygmoProblem:
         elif method == 'morris':
             results = sp.analyze_morris(print_to_console=True)
 
+        if checkpoint is not None and os.path.exists(checkpoint):
+            os.remove(checkpoint)
         print(f"Sensitivity analysis completed.")
         return results
             
@@ -154,3 +352,274 @@ class PygmoProblem:
 
         
     
+
+
+class FitnessCache:
+    """
+    A persistent cache of fitness evaluations stored in a sqlite table.
+
+    Attributes:
+        path (str): Path to the sqlite database file.
+        decimals (int): Number of decimals parameter vectors are rounded to before hashing.
+    """
+
+    def __init__(self, path, decimals = 6):
+        self.path = path
+        self.decimals = decimals
+        self._file_hashes = {}
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS fitness "
+                          "(key TEXT PRIMARY KEY, params TEXT, fitness TEXT, time REAL)")
+        self.conn.commit()
+
+    def _hash_file(self, path):
+        """Returns the hash of a file's contents, reusing it while size and mtime are unchanged."""
+        stat = os.stat(path)
+        cached = self._file_hashes.get(path)
+        if cached is None or cached[0] != (stat.st_size, stat.st_mtime_ns):
+            with open(path, 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            cached = ((stat.st_size, stat.st_mtime_ns), digest)
+            self._file_hashes[path] = cached
+        return cached[1]
+
+    def key(self, x, select_str, model_path, run_info):
+        """
+        Returns the cache key of a parameter vector evaluated with the given selection, model directory and run info.
+        """
+        h = hashlib.sha1()
+        h.update(np.round(np.asarray(x, dtype=float), self.decimals).tobytes())
+        h.update(str(select_str).encode())
+        h.update(self._hash_file(run_info).encode())
+        for root, dirs, files in os.walk(model_path):
+            dirs.sort()
+            for name in sorted(files):
+                if name == '.model_lock': continue
+                file_path = os.path.join(root, name)
+                h.update(os.path.relpath(file_path, model_path).encode())
+                h.update(self._hash_file(file_path).encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        """Returns the cached fitness for 'key', or None if not evaluated yet."""
+        row = self.conn.execute("SELECT fitness FROM fitness WHERE key = ?", (key,)).fetchone()
+        return None if row is None else np.array(json.loads(row[0]), dtype=float)
+
+    def put(self, key, x, fit):
+        """Store the fitness of parameter vector 'x'. Non-finite fitness values are not stored."""
+        fit = np.atleast_1d(np.asarray(fit, dtype=float))
+        if not np.isfinite(fit).all(): return
+        self.conn.execute("INSERT OR REPLACE INTO fitness VALUES (?, ?, ?, ?)",
+                          (key, json.dumps(np.asarray(x, dtype=float).tolist()), json.dumps(fit.tolist()), time.time()))
+        self.conn.commit()
+
+    def history(self):
+        """
+        Returns:
+            pd.DataFrame: All cached evaluations with parameter vectors, fitness values and time of evaluation.
+        """
+        df = pd.read_sql_query("SELECT params, fitness, time FROM fitness ORDER BY time", self.conn)
+        df['params'] = df['params'].apply(json.loads)
+        df['fitness'] = df['fitness'].apply(json.loads)
+        return df
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['conn'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.conn = sqlite3.connect(self.path)
+
+
+class FidelitySchedule:
+    """
+    Tracks the site subsample used for fitness evaluations in a PygmoProblem.
+
+    The subsample starts at the smallest fraction in `levels` and moves to the next one
+    when the best fitness has improved less than `tol` (relative) for `patience`
+    consecutive windows of `window` evaluations.
+    """
+
+    def __init__(self, base_select, levels, strata, tol, patience, window, successive_halving):
+        self.base_select = base_select
+        self.levels = sorted(levels)
+        self.strata = strata
+        self.tol = tol
+        self.patience = patience
+        self.window = window
+        self.successive_halving = successive_halving
+        self.level = 0
+        self._best = np.inf
+        self._window_best = np.inf
+        self._count = 0
+        self._stalled = 0
+
+    @property
+    def fraction(self):
+        return self.levels[self.level]
+
+    def select_str(self, frac = None):
+        """
+        Returns the site selection string for the workspace run at fraction 'frac' (current level by default).
+        """
+        frac = self.fraction if frac is None else frac
+        if frac >= 1: return self.base_select
+        sample = f"Stratified({frac}{''.join(', ' + col for col in self.strata or [])})"
+        if self.base_select is None: return sample
+        return ' + '.join(f'{part.strip()}; {sample}' for part in self.base_select.split('+'))
+
+    def update(self, fits):
+        """
+        Record the fitness of new evaluations and move to the next level if converged.
+        """
+        fits = np.asarray(fits, dtype=float)
+        if np.isfinite(fits).any():
+            self._window_best = min(self._window_best, np.nanmin(fits))
+        self._count += len(fits)
+        if self._count < self.window: return
+
+        improved = self._best - self._window_best > self.tol * abs(self._best) if np.isfinite(self._best) else True
+        self._best = min(self._best, self._window_best)
+        self._stalled = 0 if improved else self._stalled + 1
+        self._count, self._window_best = 0, np.inf
+
+        if self._stalled >= self.patience and self.level < len(self.levels) - 1:
+            self.level += 1
+            print(f"Increasing site subsample to {self.fraction:.0%} of selected sites")
+            # Fitness on the new subsample is not comparable with the previous one
+            self._best, self._stalled = np.inf, 0
+
+
+class SurrogateProblem:
+    """
+    A pygmo problem that wraps a PygmoProblem with a surrogate model to reduce the number of model runs.
+
+    Every evaluated (parameter vector, fitness) pair is stored. Once enough pairs are available,
+    a regressor is trained on them and used to pre-screen candidates: only vectors with sufficient
+    expected improvement over the best fitness found so far are evaluated with EPIC, the rest
+    get the surrogate prediction. Supports single objective problems only.
+
+    Attributes:
+        problem (PygmoProblem): The wrapped problem used for real evaluations.
+        model (str): Surrogate regressor, 'gp' (Gaussian process) or 'rf' (random forest).
+        n_initial (int): Number of real evaluations before the surrogate is used.
+        ei_threshold (float): Minimum expected improvement, as a fraction of the observed fitness range,
+                              for a candidate to be evaluated with the model.
+        refit_every (int): Number of new real evaluations after which the surrogate is retrained.
+        history (list): Log of all evaluations as dicts with the parameters, fitness and source.
+    """
+
+    def __init__(self, problem, model = 'gp', n_initial = 20, ei_threshold = 0.01, refit_every = 5):
+        if model not in ('gp', 'rf'):
+            raise ValueError("Unsupported surrogate model. Choose from 'gp' or 'rf'.")
+        self.problem = problem
+        self.model = model
+        self.n_initial = n_initial
+        self.ei_threshold = ei_threshold
+        self.refit_every = refit_every
+        self.history = []
+        self._X, self._y = [], []
+        self._regressor = None
+        self._fitted_on = 0
+
+    def get_bounds(self):
+        return self.problem.get_bounds()
+
+    def get_name(self):
+        return f"Surrogate ({self.model}) assisted EPIC calibration"
+
+    @property
+    def var_names(self):
+        return self.problem.var_names
+
+    @property
+    def n_real(self):
+        """Number of evaluations done with the EPIC model."""
+        return len(self._y)
+
+    @property
+    def n_surrogate(self):
+        """Number of evaluations answered by the surrogate."""
+        return len(self.history) - len(self._y)
+
+    @property
+    def log(self):
+        """
+        Returns:
+            pd.DataFrame: All evaluations with parameter values, fitness and source ('real' or 'surrogate').
+        """
+        return pd.DataFrame(self.history)
+
+    def fitness(self, x):
+        return self.batch_fitness(np.asarray(x, dtype=float))
+
+    def batch_fitness(self, dvs):
+        """
+        Pre-screen the candidates with the surrogate and evaluate the promising ones with the model.
+
+        Args:
+            dvs (np.array): Decision vectors of all candidates, concatenated.
+
+        Returns:
+            np.array: Fitness of all candidates, concatenated.
+        """
+        xs = np.reshape(dvs, (-1, len(self.problem.bounds)))
+        fits = np.empty(len(xs))
+        real = np.ones(len(xs), dtype=bool)
+
+        if self.n_real >= self.n_initial:
+            self._fit()
+            mu, sigma = self._predict(xs)
+            real = self._expected_improvement(mu, sigma) >= self.ei_threshold * np.ptp(self._y)
+            fits[~real] = mu[~real]
+
+        if real.any():
+            real_fits = self.problem.batch_fitness(xs[real].flatten()).reshape(real.sum(), -1)
+            if real_fits.shape[1] > 1:
+                raise ValueError("SurrogateProblem supports single objective problems only.")
+            fits[real] = real_fits[:, 0]
+            self._X.extend(xs[real])
+            self._y.extend(real_fits[:, 0])
+
+        for x, f, is_real in zip(xs, fits, real):
+            self.history.append({**dict(zip(self.var_names, x)), 'fitness': f,
+                                 'source': 'real' if is_real else 'surrogate'})
+        return fits
+
+    def _scale(self, xs):
+        lower, upper = self.get_bounds()
+        return (xs - lower) / np.where(upper > lower, upper - lower, 1)
+
+    def _fit(self):
+        """Retrain the surrogate if enough new real evaluations are available."""
+        if self._regressor is not None and self.n_real - self._fitted_on < self.refit_every:
+            return
+        if self.model == 'gp':
+            from sklearn.gaussian_process import GaussianProcessRegressor
+            from sklearn.gaussian_process.kernels import Matern, WhiteKernel
+            kernel = Matern(nu=2.5) + WhiteKernel()
+            self._regressor = GaussianProcessRegressor(kernel, normalize_y=True, n_restarts_optimizer=2)
+        else:
+            from sklearn.ensemble import RandomForestRegressor
+            self._regressor = RandomForestRegressor(n_estimators=100, min_samples_leaf=2)
+        self._regressor.fit(self._scale(np.array(self._X)), np.array(self._y))
+        self._fitted_on = self.n_real
+
+    def _predict(self, xs):
+        """Returns the predicted mean and standard deviation of the fitness."""
+        xs = self._scale(xs)
+        if self.model == 'gp':
+            return self._regressor.predict(xs, return_std=True)
+        preds = np.stack([tree.predict(xs) for tree in self._regressor.estimators_])
+        return preds.mean(axis=0), preds.std(axis=0)
+
+    def _expected_improvement(self, mu, sigma):
+        """Expected improvement over the best real fitness, for minimisation."""
+        from scipy.stats import norm
+        improvement = np.min(self._y) - mu
+        sigma = np.maximum(sigma, 1e-12)
+        z = improvement / sigma
+        return improvement * norm.cdf(z) + sigma * norm.pdf(z)
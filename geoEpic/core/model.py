@@ -5,9 +5,15 @@ import subprocess
 # import pandas as pd
 import numpy as np
 from geoEpic.io import ConfigParser
+from geoEpic.utils import parallel_executor
 import platform
 import atexit
 import signal
+import time
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 
 class EPICModel:
@@ -41,6 +47,7 @@ class EPICModel:
         self.output_dir = os.path.dirname(self.path)
         self.log_dir = os.path.dirname(self.path)
         self.output_types = ['ACY']
+        self.pool = None
 
         if platform.system() != "Windows":
             # On Unix-like systems, use chmod to make the file executable
@@ -161,47 +168,47 @@ class EPICModel:
             Exception: If any output file is not generated or is empty.
         """
         fid = site.site_id
-        new_dir = os.path.join(self.cache_path, 'EPICRUNS', str(fid)) #if dest is None else dest
-
-        # Copy all contents from source_dir to new_dir
-        # os.makedirs(new_dir, exist_ok=True)
-        # subprocess.run(["rsync", "-a", "--delete", f"{self.path}/", new_dir], check=True)
-        if os.path.exists(new_dir):
-            shutil.rmtree(new_dir)
-
-        shutil.copytree(self.path, new_dir)
+        # Run in a pre-staged copy when the pool holds copies of this model directory
+        pooled = self.pool is not None and self.pool.available and self.pool.source == self.path
+        if pooled:
+            new_dir = self.pool.acquire()
+        else:
+            new_dir = os.path.join(self.cache_path, 'EPICRUNS', str(fid)) #if dest is None else dest
+            if os.path.exists(new_dir):
+                shutil.rmtree(new_dir)
+            shutil.copytree(self.path, new_dir)
         os.chdir(new_dir)
 
-        # Prepare weather data
-        dly = site.get_dly()
-        dly.save(fid)
-        dly.to_monthly(fid)
-        
-        # Write configuration files
-        self.writeDATFiles(site)
-
-        # Run EPIC executable
-        log_file = f"{fid}.out"
-        with open(log_file, 'w') as log:
-            subprocess.run([self.executable], stdout=log, stderr=log)
-
-        # Process output files
-        for out_type in self.output_types:
-            out_path = f'{fid}.{out_type}'
-            if not os.path.exists(out_path) or os.path.getsize(out_path) == 0:
-                shutil.move(log_file, os.path.join(self.log_dir, f"{fid}.out"))
-                os.chdir(self.base_dir)
-                if self.delete_after_run or self.cache_path == '/dev/shm':
-                    shutil.rmtree(new_dir)
-                raise FileNotFoundError(f"Output file ({out_type}) not found or empty. Check {log_file} for details")
-            dst = os.path.join(self.output_dir if dest is None else os.path.dirname(new_dir), out_path)
-            shutil.move(out_path, dst)
-            site.outputs[out_type] = dst
-
-        # Clean up
-        os.chdir(self.base_dir)
-        if self.delete_after_run or self.cache_path == '/dev/shm':
-            shutil.rmtree(new_dir)  
+        try:
+            # Prepare weather data
+            dly = site.get_dly()
+            dly.save(fid)
+            dly.to_monthly(fid)
+            
+            # Write configuration files
+            self.writeDATFiles(site)
+
+            # Run EPIC executable
+            log_file = f"{fid}.out"
+            with open(log_file, 'w') as log:
+                subprocess.run([self.executable], stdout=log, stderr=log)
+
+            # Process output files
+            for out_type in self.output_types:
+                out_path = f'{fid}.{out_type}'
+                if not os.path.exists(out_path) or os.path.getsize(out_path) == 0:
+                    shutil.move(log_file, os.path.join(self.log_dir, f"{fid}.out"))
+                    raise FileNotFoundError(f"Output file ({out_type}) not found or empty. Check {log_file} for details")
+                dst = os.path.join(self.output_dir if dest is None else os.path.dirname(new_dir), out_path)
+                shutil.move(out_path, dst)
+                site.outputs[out_type] = dst
+        finally:
+            # Clean up
+            os.chdir(self.base_dir)
+            if pooled:
+                self.pool.release(new_dir)
+            elif self.delete_after_run or self.cache_path == '/dev/shm':
+                shutil.rmtree(new_dir, ignore_errors=True)
 
 
     def writeDATFiles(self, site):
@@ -302,3 +309,231 @@ class EPICModel:
             
             file.seek(0)
             file.writelines(lines)
+
+
+
+class ModelPool:
+    """
+    A pool of pre-staged copies of a model directory, reused across site runs.
+
+    Each slot is a full copy of the model directory, created once when the pool is opened.
+    A slot is claimed with an exclusive lock on its lock file, so a slot held by a process
+    that dies is freed by the OS. Slots are checked against the model directory on release,
+    and a slot left behind by a crashed run is repaired by the next process claiming it.
+    Slots are locked with fcntl, so on Windows the pool is not available: 'open', 'check' and
+    'broadcast' do nothing and EPICModel.run copies the model directory for each run instead.
+
+    Attributes:
+        source (str): Model directory the slots are copied from.
+        base_dir (str): Directory holding the slots.
+        size (int): Number of slots.
+        manifest (dict): Size and modification time of each file in the model directory, by relative path.
+    """
+
+    # Files rewritten for every site by EPICModel.writeDATFiles
+    run_files = {'EPICRUN.DAT', 'ieSite.DAT', 'ieSllist.DAT', 'ieWedlst.DAT', 'ieWealst.DAT', 'ieOplist.DAT'}
+    available = fcntl is not None
+
+    def __init__(self, source, base_dir, size):
+        """
+        Initialize the pool. Slots are created with `open`.
+
+        Args:
+            source (str): Model directory to copy into each slot.
+            base_dir (str): Directory to hold the slots, on a RAM-backed filesystem if possible.
+            size (int): Number of slots, usually the number of workers.
+        """
+        self.source = source
+        self.base_dir = base_dir
+        self.size = size
+        self.manifest = {}
+        self._held = {}
+
+    def open(self):
+        """Create all slots from the model directory."""
+        if not self.available: return
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.manifest = self._scan(self.source)
+        slots = [self._slot(i) for i in range(self.size)]
+        parallel_executor(self._stage, slots, method='Thread', max_workers=min(8, self.size), bar=False)
+
+    def close(self):
+        """Remove all slots."""
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def acquire(self, timeout=120):
+        """
+        Claim a free slot, repairing it if its previous holder did not release it.
+
+        Args:
+            timeout (float): Seconds to wait for a free slot.
+
+        Returns:
+            str: Path of the claimed slot.
+
+        Raises:
+            TimeoutError: If no slot becomes free within the timeout.
+        """
+        deadline = time.time() + timeout
+        wait = 0.001
+        start = os.getpid() % self.size
+        while True:
+            for k in range(self.size):
+                i = (start + k) % self.size
+                fd = self._lock(i, blocking=False)
+                if fd is not None: break
+            if fd is not None: break
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for a model slot after {timeout} seconds")
+            time.sleep(wait)
+            wait = min(wait * 2, 0.05)
+
+        slot = self._slot(i)
+        marker = f'{slot}.busy'
+        if not os.path.isdir(slot):
+            self._stage(slot)
+        elif os.path.exists(marker):
+            self._repair(slot)
+        open(marker, 'w').close()
+        self._held[slot] = fd
+        return slot
+
+    def release(self, slot):
+        """
+        Restore a slot to the state of the model directory and free it.
+
+        Args:
+            slot (str): Path of a slot returned by `acquire`.
+        """
+        try:
+            self._repair(slot)
+            os.remove(f'{slot}.busy')
+        finally:
+            fd = self._held.pop(slot)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def check(self):
+        """
+        Check all free slots against the model directory and repair damaged ones.
+
+        Returns:
+            int: Number of slots that had to be repaired.
+        """
+        repaired = 0
+        if not self.available: return repaired
+        for i in range(self.size):
+            fd = self._lock(i, blocking=False)
+            if fd is None: continue
+            try:
+                slot = self._slot(i)
+                if not os.path.isdir(slot):
+                    self._stage(slot)
+                    repaired += 1
+                elif self._repair(slot):
+                    repaired += 1
+                if os.path.exists(f'{slot}.busy'):
+                    os.remove(f'{slot}.busy')
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+        return repaired
+
+    def broadcast(self, files=None):
+        """
+        Copy files of the model directory into every slot, e.g. parameter files edited during calibration.
+        Waits for slots in use, so it should be called between runs.
+
+        Args:
+            files (list of str, optional): File paths relative to the model directory.
+                If None, all files changed since the slots were last updated are copied.
+
+        Returns:
+            list: The files copied.
+        """
+        if not self.available: return []
+        current = self._scan(self.source)
+        if files is None:
+            files = [rel for rel, stat in current.items() if self.manifest.get(rel) != stat]
+        files = [rel for rel in files if rel in current]
+        if not files: return files
+        for i in range(self.size):
+            fd = self._lock(i, blocking=True)
+            try:
+                for rel in files:
+                    shutil.copy2(os.path.join(self.source, rel), os.path.join(self._slot(i), rel))
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+        self.manifest.update({rel: current[rel] for rel in files})
+        return files
+
+    def _slot(self, i):
+        return os.path.join(self.base_dir, str(i))
+
+    def _lock(self, i, blocking):
+        """Lock slot 'i', returning the lock file descriptor or None if it is held elsewhere."""
+        fd = os.open(f'{self._slot(i)}.lock', os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def _stage(self, slot):
+        if os.path.exists(slot):
+            shutil.rmtree(slot)
+        shutil.copytree(self.source, slot, ignore=shutil.ignore_patterns('.model_lock'))
+
+    def _scan(self, path):
+        """Returns (size, mtime) of each file under 'path' by relative path."""
+        manifest = {}
+        for root, dirs, files in os.walk(path):
+            for name in files:
+                if name == '.model_lock': continue
+                st = os.stat(os.path.join(root, name))
+                manifest[os.path.relpath(os.path.join(root, name), path)] = (st.st_size, st.st_mtime_ns)
+        return manifest
+
+    def _repair(self, slot):
+        """
+        Remove files created in a slot and restore files changed or deleted by a run.
+
+        Returns:
+            int: Number of files removed or restored.
+        """
+        fixed = 0
+        seen = set()
+        for root, dirs, files in os.walk(slot):
+            for name in list(dirs):
+                rel = os.path.relpath(os.path.join(root, name), slot)
+                if not os.path.isdir(os.path.join(self.source, rel)):
+                    shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+                    dirs.remove(name)
+                    fixed += 1
+            for name in files:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, slot)
+                if rel in self.run_files:
+                    continue
+                stat = self.manifest.get(rel)
+                if stat is None:
+                    os.remove(path)
+                    fixed += 1
+                    continue
+                seen.add(rel)
+                st = os.stat(path)
+                if (st.st_size, st.st_mtime_ns) != stat:
+                    shutil.copy2(os.path.join(self.source, rel), path)
+                    fixed += 1
+        for rel in self.manifest.keys() - seen - self.run_files:
+            os.makedirs(os.path.dirname(os.path.join(slot, rel)), exist_ok=True)
+            shutil.copy2(os.path.join(self.source, rel), os.path.join(slot, rel))
+            fixed += 1
+        return fixed
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_held'] = {}
+        return state
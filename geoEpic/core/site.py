@@ -1,5 +1,4 @@
 import os
-from geoEpic.weather import DailyWeather
 from geoEpic.io import DLY, SIT, OPC, SOL
 import os
 
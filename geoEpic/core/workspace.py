@@ -5,11 +5,9 @@ import pandas as pd
 from functools import wraps
 from geoEpic.io import DataLogger, ConfigParser
 from geoEpic.utils import parallel_executor, filter_dataframe
-from .model import EPICModel
+from .model import EPICModel, ModelPool
 from .site import Site
-import geopandas as gpd
 from glob import glob
-# from geoEpic.utils.redis import WorkerPool
 from shortuuid import uuid 
 import signal
 import atexit
@@ -67,8 +65,10 @@ class Workspace:
         self.data_logger = DataLogger(self.cache)
 
         # Initialise Model pool
-        # epicruns_dir = os.path.join(self.cache, 'EPICRUNS')
-        # WorkerPool(self.uuid, epicruns_dir).open(self.config["num_of_workers"]*2)
+        pool_dir = os.path.join(self.cache, 'EPICRUNS', '.pool')
+        self.model_pool = ModelPool(self.model.path, pool_dir, self.config["num_of_workers"])
+        self.model_pool.open()
+        self.model.pool = self.model_pool
         
         # Warning while use more workers
         if self.config["num_of_workers"] > os.cpu_count():
@@ -86,8 +86,8 @@ class Workspace:
         exit(0)
     
     def cache_cleanup(self):
-        # Close worker pool and delete cache
-        # WorkerPool(self.uuid).close()
+        # Close model pool and delete cache
+        self.model_pool.close()
         self.model.close()
         shutil.rmtree(self.cache)
 
@@ -201,15 +201,8 @@ class Workspace:
         else:
             raise ValueError("Input must be a Site object or a dictionary containing site information.")
 
-        # Acquire a worker from the model pool
-        # model_pool = WorkerPool(self.uuid)
-        # dst_dir = model_pool.acquire()
-        # try:
-            # Run the model and routines for the site
+        # Run the model in a slot of the model pool
         self.model.run(site)
-        # finally:
-            # Release the worker back to the model pool
-            # model_pool.release(dst_dir)
         # Post Process Simulation outcomes
         results = self.post_process(site)
         # Handle output files
@@ -243,6 +236,9 @@ class Workspace:
         info = filter_dataframe(pd.read_csv(self.run_info), select_str)
         info_ls = info.to_dict('records')
 
+        # Push model files edited since the last run into the pool
+        self.model_pool.broadcast()
+
         # Run first simulation for error check, if progress bar is enabled
         if progress_bar: self.run_simulation(info_ls.pop(0))
         # Execute simulations in parallel
@@ -257,7 +253,71 @@ class Workspace:
 
         # Return result of objective function if defined, else None
         return self.objective_function() if self.objective_function else None
-    
+
+    def run_batch(self, model_paths, select_str = None, progress_bar = False):
+        """
+        Run simulations for several model directories through a single worker pool.
+
+        Each model directory is treated as one candidate: its sites are run with the
+        files in that directory, logged to a separate DataLogger and evaluated with
+        the objective function once all simulations have finished.
+
+        Args:
+            model_paths (list of str): Model directories, one per candidate.
+            select_str (str, optional): String to filter sites. Defaults to None.
+            progress_bar (bool): Display a progress bar over all simulations.
+
+        Returns:
+            list: The result of the objective function for each model directory, or None if not set.
+        """
+        select_str = select_str or self.config["select"]
+        info = filter_dataframe(pd.read_csv(self.run_info), select_str)
+        info_ls = info.to_dict('records')
+
+        # Separate run directories and logs for each candidate
+        candidates = []
+        for i, model_path in enumerate(model_paths):
+            run_dir = os.path.join(self.cache, 'batch', str(i))
+            os.makedirs(run_dir, exist_ok=True)
+            logger = DataLogger(run_dir, backend=self.data_logger.backend)
+            candidates.append((model_path, run_dir, logger))
+
+        tasks = [(*candidate, site_info) for candidate in candidates for site_info in info_ls]
+        parallel_executor(
+            self._run_batch_task,
+            tasks,
+            method='Process',
+            max_workers=self.config["num_of_workers"],
+            timeout=self.config["timeout"],
+            bar=progress_bar
+        )
+
+        if not self.objective_function:
+            return [None] * len(candidates)
+
+        # Evaluate objective function against each candidate's logs
+        data_logger = self.data_logger
+        results = []
+        try:
+            for _, _, logger in candidates:
+                self.data_logger = logger
+                results.append(self.objective_function())
+        finally:
+            self.data_logger = data_logger
+        return results
+
+    def _run_batch_task(self, task):
+        """
+        Run a single site for one candidate of `run_batch`.
+        Executed on a copy of the workspace inside a worker process.
+        """
+        model_path, run_dir, logger, site_info = task
+        self.model.path = model_path
+        self.model.cache_path = run_dir
+        self.model.output_dir = run_dir
+        self.data_logger = logger
+        return self.run_simulation(site_info)
+
     def post_process(self, site):
         """
         Execute routines in parallel and return their results in a dictionary.
@@ -316,6 +376,7 @@ class Workspace:
             if not required_columns_csv.issubset(set(data.columns)):
                 raise ValueError("CSV file missing one or more required columns: 'SiteID', 'soil', 'opc', 'dly', 'lat', 'lon'")
         elif file_path.lower().endswith('.shp'):
+            import geopandas as gpd
             data = gpd.read_file(file_path)
             data = data.to_crs(epsg=4326)  # Convert to latitude and longitude projection
             data['lat'] = data.geometry.centroid.y
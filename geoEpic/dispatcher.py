@@ -1,6 +1,9 @@
 import subprocess
 import os
 import sys
+import shlex
+import importlib
+import traceback
 
 # Mapping of modules and functions to their respective relative paths
 script_paths = {
@@ -11,13 +14,16 @@ script_paths = {
         "crop_csb": "utils/crop_csb.py",
         "gee": "gee/fetch.py",
         "change_ee_project":"gee/change_project.py",
-        "generate_opc":"opc/generate_opc.py"
+        "generate_opc":"opc/generate_opc.py",
+        "import_time": "utils/import_time.py",
+        "benchmark": "utils/benchmark.py"
     },
     "weather": {
         "gee_w": "weather/gee.py",
         "windspeed": "weather/nldas_ws_gee.py",
         "daymet": "weather/download_daymet.py",
         "download_daily": "weather/download_daily.py",
+        "tiles": "weather/tiles.py",
         "daily2monthly": "weather/daily2monthly.py"
     },
     "soil": {
@@ -64,8 +70,23 @@ def find_function(func_name):
 
 
 def dispatch(module, func, options_str, wait=True):
+    """
+    Run a geo_epic command.
+
+    Commands are run in the current interpreter by calling the `main` function of their
+    script, with the working directory restored afterwards. Commands not waited for are
+    started in a separate process.
+
+    Args:
+        module (str): Module of the command, e.g. 'workspace'. Looked up from `func` if None.
+        func (str): Function of the command, e.g. 'run'. The module default if None.
+        options_str (str or list): Command line options for the command.
+        wait (bool): Wait for the command to finish.
+
+    Returns:
+        int: Exit code of the command, or None if not waited for.
+    """
     root_path = os.path.dirname(__file__)
-    command = f'{sys.executable} {{script_path}} {options_str}'
 
     if not module:
         module, relative_path = find_function(func)
@@ -80,13 +101,25 @@ def dispatch(module, func, options_str, wait=True):
     else:
         raise DispatchError(f"Command '{module} {func}' not found.")
 
-    env = os.environ.copy()
-    command = command.format(script_path=script_path)
+    argv = shlex.split(options_str) if isinstance(options_str, str) else list(options_str)
 
-    if wait:
-        subprocess.Popen(command, shell=True, env=env).wait()
-    else:
-        subprocess.Popen(command, shell=True, env=env)
+    if not wait:
+        env = os.environ.copy()
+        subprocess.Popen([sys.executable, script_path, *argv], env=env)
+        return None
+
+    module_name = 'geoEpic.' + os.path.splitext(relative_path)[0].replace('/', '.')
+    cwd = os.getcwd()
+    try:
+        importlib.import_module(module_name).main(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        os.chdir(cwd)
+    return 0
 
 
 def print_expected_usage():
@@ -111,11 +144,11 @@ def main():
         module = first_arg
         if len(args) > 1 and args[1] in script_paths[module]:
             func = args[1]
-            options_str = " ".join(args[2:])
+            options_str = args[2:]
         else:
             if module in default_functions:
                 func = default_functions[module]
-                options_str = " ".join(args[1:])
+                options_str = args[1:]
             else:
                 print_expected_usage()
                 return
@@ -123,12 +156,12 @@ def main():
         module, _ = find_function(first_arg)
         if module:
             func = first_arg
-            options_str = " ".join(args[1:])
+            options_str = args[1:]
         else:
             print_expected_usage()
             return
 
-    dispatch(module, func, options_str)
+    sys.exit(dispatch(module, func, options_str))
 
 if __name__ == '__main__':
     main()
@@ -1,7 +1,8 @@
 import argparse
 import os
 import sys
-from core import *
+import pandas as pd
+from geoEpic.gee.core import CompositeCollection
 from geoEpic.utils import parallel_executor
 import geopandas as gpd
 from time import time
@@ -74,13 +75,13 @@ def fetch_list(config_file, input_data, output_dir):
     fetch_data_wrapper(filtered_ls[0])
     parallel_executor(fetch_data_wrapper, filtered_ls[1:], max_workers=40)
         
-def main():
+def main(argv = None):
     parser = argparse.ArgumentParser(description="Fetch and output data from GEE")
     parser.add_argument('config_file', help='Path to the configuration file')
     parser.add_argument('--fetch', metavar='INPUT', nargs='+', help='Latitude and longitude as two floats, or a file path')
     parser.add_argument('--out', default='./', dest='output_path', help='Output directory or file path for the fetched data')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     try:
         if len(args.fetch) == 2:
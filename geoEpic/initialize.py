@@ -31,6 +31,10 @@ def update_template_config_file():
                             'slope': f'{home_dir}/GeoEPIC_metadata/slope_us.tif',
         }, })
     
-setup_metadata()
-update_template_config_file()
+def main(argv = None):
+    setup_metadata()
+    update_template_config_file()
+
+if __name__ == '__main__':
+    main()
 
@@ -3,7 +3,10 @@ import pandas as pd
 import sqlite3
 import csv
 import json
-import fcntl
+try:
+    import fcntl
+except ImportError:  # Windows, where CSV files are written without locks
+    fcntl = None
 import time
 import random
 import importlib
@@ -24,7 +27,7 @@ class CSVWriter:
         if mode: self.mode = mode
         self.file_handle = open(self.file_path, self.mode)
         self.writer = csv.writer(self.file_handle)
-        fcntl.flock(self.file_handle, fcntl.LOCK_EX)  # Lock the file
+        if fcntl: fcntl.flock(self.file_handle, fcntl.LOCK_EX)  # Lock the file
         # Check if we need to write headers by checking if the file is empty
         if os.stat(self.file_path).st_size == 0:
             self.headers_written = False
@@ -78,7 +81,7 @@ class CSVWriter:
     def close(self):
         """Release the lock and close the CSV file."""
         if self.file_handle is not None:
-            fcntl.flock(self.file_handle, fcntl.LOCK_UN)  # Unlock the file
+            if fcntl: fcntl.flock(self.file_handle, fcntl.LOCK_UN)  # Unlock the file
             self.file_handle.close()
             self.file_handle = None
 
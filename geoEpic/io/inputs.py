@@ -3,7 +3,6 @@ import numpy as np
 import pandas as pd
 from tqdm import tqdm
 from datetime import datetime
-from geoEpic.soil.sda import SoilDataAccess
 
 class SOL:
     def __init__(self, soil_id=None, albedo=None, hydgrp=None, num_layers=None, layers_df=None):
@@ -40,6 +39,7 @@ class SOL:
         Returns:
             Soil: A new Soil object populated with data from SDA.
         """
+        from geoEpic.soil.sda import SoilDataAccess
         layers_df = SoilDataAccess.fetch_properties(query)
         
         soil_id = int(layers_df['mukey'].iloc[0])
@@ -5,6 +5,10 @@ import os
 
 class CropCom:
     
+    # Fixed width format of each column in the CROPCOM file
+    formats = ['%5d', '%5s'] + ['%8.2f']*11 + ['%8.4f'] + ['%8.2f']*5 + ['%8.4f']*3 + \
+              ['%8.2f']*6 + ['%8.4f']*9 + ['%8.3f']*3 + ['%8d'] + ['%8.2f']*18 + ['%8.3f'] + ['  %s']
+
     def __init__(self, path):
         """
         Load data from a file into DataFrame.
@@ -23,6 +27,22 @@ class CropCom:
         # Split the specified columns
         self._split_integer_decimal()
 
+    @property
+    def data(self):
+        """
+        DataFrame of the CROPCOM file, with pending edits applied.
+        """
+        self._flush()
+        # The frame may be modified by the caller, so the file template is rebuilt on next save
+        self._template = None
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._pending = None
+        self._template = None
+
     def _split_integer_decimal(self):
         for col in self.split_columns:
             int_col = col + '_v1'
@@ -34,7 +54,7 @@ class CropCom:
             self.data.insert(int_idx + 1, int_col, self.data.pop(int_col))
 
     def _combine_integer_decimal(self):
-        data = self.data.copy()
+        data = self._data.copy()
         for col in self.split_columns:
             int_col = col + '_v1'
             dec_col = col + '_v2'
@@ -43,15 +63,58 @@ class CropCom:
         data = data[self.original_columns]
         return data
 
+    def _flush(self):
+        """
+        Write pending edits of sensitive parameters into the DataFrame.
+        """
+        if self._pending is None: return
+        cols = self.prms['Parm'].values
+        for rows, vals in zip(self._rows, self._pending):
+            self._data.loc[self._data.index[rows], cols] = vals
+        self._pending = None
+
+    def _build_template(self):
+        """
+        Format the whole file once and record, for each crop row, the static text around
+        the fields that depend on sensitive parameters. Later saves only format those fields.
+        """
+        self._flush()
+        cols = list(self.prms['Parm'].values)
+        fields = []
+        for col in cols:
+            base = col[:-3] if col[-3:] in ('_v1', '_v2') and col[:-3] in self.split_columns else col
+            if base in self.original_columns and base not in fields:
+                fields.append(base)
+        fields.sort(key=self.original_columns.index)
+
+        # Data columns each field is computed from, and their static values per row
+        self._fields = []
+        for field in fields:
+            inputs = [field + '_v1', field + '_v2'] if field in self.split_columns else [field]
+            self._fields.append((field, inputs, self.formats[self.original_columns.index(field)]))
+        self._static = {c: self._data[c].values for _, inputs, _ in self._fields for c in inputs}
+
+        # Text of each row split around the sensitive fields
+        positions = [self.original_columns.index(field) for field in fields]
+        self._segments = []
+        self._template = list(self.header)
+        for row in self._combine_integer_decimal().values:
+            text = [fmt % value for fmt, value in zip(self.formats, row)] + ['\n']
+            bounds = [-1] + positions + [len(text)]
+            self._segments.append([''.join(text[bounds[k] + 1:bounds[k + 1]]) for k in range(len(bounds) - 1)])
+            self._template.append(''.join(text))
+
     @property
     def current(self):
         """
         Returns the current values of parameters in the DataFrame.
         """
+        if self._pending is not None:
+            return self._pending.flatten()
         cols = self.prms['Parm'].values
         all_values = []
         for crop in self.crops:
-            crop_values = self.data.loc[self.data['#'] == crop, cols].values.flatten()
+            crop_values = self._data.loc[self._data['#'] == crop, cols].values.flatten()
             all_values.append(crop_values)
         concatenated_values = np.concatenate(all_values)
         return concatenated_values
@@ -60,24 +123,38 @@ class CropCom:
         """
         Save DataFrame into an OPC file.
         """
-        data = self._combine_integer_decimal()
         if not path.endswith('.DAT'): 
           path = os.path.join(path, 'CROPCOM.DAT')
+        if self.prms is None:
+            data = self._combine_integer_decimal()
+            with open(path, 'w') as ofile:
+                ofile.write(''.join(self.header))
+                fmt = ''.join(self.formats)
+                np.savetxt(ofile, data.values, fmt = fmt)
+            return
+
+        if self._template is None: self._build_template()
+        if self._pending is not None:
+            cols = self.prms['Parm'].values
+            for rows, vals in zip(self._rows, self._pending):
+                vals = dict(zip(cols, vals))
+                for r in rows:
+                    segments = self._segments[r]
+                    parts = [segments[0]]
+                    for k, (field, inputs, fmt) in enumerate(self._fields):
+                        v = [vals[c] if c in vals else self._static[c][r] for c in inputs]
+                        value = int(v[0]) + v[1]/100 if len(v) == 2 else v[0]
+                        parts.append(fmt % value)
+                        parts.append(segments[k + 1])
+                    self._template[len(self.header) + r] = ''.join(parts)
         with open(path, 'w') as ofile:
-            ofile.write(''.join(self.header))
-            fmt = '%5d%5s' + '%8.2f'*11 + '%8.4f' + \
-              '%8.2f'*5 + '%8.4f'*3 + '%8.2f'*6 + '%8.4f'*9 + \
-              '%8.3f'*3 + '%8d' + '%8.2f'*18 + '%8.3f' + '  %s'
-            np.savetxt(ofile, data.values, fmt = fmt)
+            ofile.write(''.join(self._template))
     
     def edit(self, values):
         """
         Updates the parameters in the DataFrame with new values.
         """
-        cols = self.prms['Parm'].values
-        values_split = np.split(values, self.split[:-1])
-        for i, id in enumerate(self.crops):
-            self.data.loc[self.data['#'] == id, cols] = values_split[i]
+        self._pending = np.reshape(np.asarray(values, dtype=float), (len(self.crops), len(self.prms)))
 
     def set_sensitive(self, df_paths, crop_codes, all = False):
         """
@@ -105,9 +182,14 @@ class CropCom:
             # Filter parameters where 'Select' is True
             prms = prms[prms['Select'] == 1]
             prms['Range'] = prms.apply(lambda x: (x['Min'], x['Max']), axis=1)
+        self._flush()
         self.prms = prms.copy()
         self.crops = crop_codes
         self.split = np.cumsum([len(self.prms)]*len(crop_codes))
+
+        # Row positions of each crop used to apply edits
+        self._rows = [np.flatnonzero(self._data['#'].values == crop) for crop in crop_codes]
+        self._template = None
     
     def constraints(self):
         """
@@ -136,6 +218,69 @@ class ieParm:
         self.name = 'ieParm'
         self.prms = None
 
+    @property
+    def data(self):
+        """
+        DataFrame of the ieParm file, with pending edits applied.
+        """
+        self._flush()
+        # The frame may be modified by the caller, so the file template is rebuilt on next save
+        self._template = None
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._pending = None
+        self._template = None
+
+    def _flush(self):
+        """
+        Write pending edits of sensitive parameters into the DataFrame.
+        """
+        if self._pending is None: return
+        self._data.loc[0, self.prms['Parm'].values] = self._pending
+        self._pending = None
+
+    @staticmethod
+    def _format_parm(col):
+        """
+        Format a PARM value with the decimals needed to represent it, at least 2.
+        """
+        if np.isnan(col): col = 0
+        max_dec = 7 - len(str(int(col)))
+        col = np.round(col, max_dec)
+        dec = 0 if col == int(col) else len(str(Decimal(str(col))).split(".")[1])
+        if dec <= 2: fmt = "%8.2f"
+        else: fmt = f"%8.{dec}f"
+        return fmt % col
+
+    def _build_template(self):
+        """
+        Format all fields of the file once, and record the line and field of each column.
+        Later saves only reformat the fields of sensitive parameters.
+        """
+        self._flush()
+        values = self._data.iloc[0]
+        self._template = []
+        self._positions = {}
+        # SCRP lines, the 28th line is left blank
+        for i in range(1, 31):
+            if i == 28:
+                self._template.append(['\n'])
+                continue
+            for j in (1, 2):
+                self._positions[f'SCRP{j}_{i}'] = (i - 1, j - 1, lambda v: '%8.2f' % v)
+            self._template.append(['%8.2f' % values[f'SCRP1_{i}'], '%8.2f' % values[f'SCRP2_{i}'], '\n'])
+        # PARM lines, 10 values per line
+        for i in range(12):
+            fields = []
+            for j in range(10):
+                name = f'PARM{10 * i + j + 1}'
+                self._positions[name] = (30 + i, j, self._format_parm)
+                fields.append(self._format_parm(values[name]))
+            self._template.append(fields + ['\n'])
+
     def read_parm(self, file_name):
         """
         Reads and constructs a DataFrame from a .DAT file.
@@ -165,50 +310,30 @@ class ieParm:
         """
         if not path.endswith('.DAT'): 
             path = os.path.join(path, 'ieParm.DAT')
-        PARM1 = self.data[[col for col in self.data.columns if "SCRP" in col]]
-        PARM2 = self.data[[col for col in self.data.columns if "PARM" in col]]
-        
-        PARM1_data = PARM1.values.reshape((2, 30)).T
-        PARM2_values = PARM2.values.flatten()
-        nan_mask = np.isnan(PARM2_values)
-        PARM2_values[nan_mask] = 0  # Replace NaNs with zeros
-        # full_parm2_data = np.empty(self.nan_mask.size)
-        # full_parm2_data[:] = np.nan
-        # full_parm2_data[~self.nan_mask] = PARM2_values
-        PARM2_data = PARM2_values.reshape((12, 10))
-        
-        s = ''
-        for row in PARM2_data:
-            for col in row:
-                if np.isnan(col): break
-                max_dec = 7 - len(str(int(col)))
-                col = np.round(col, max_dec)
-                dec = 0 if col == int(col) else len(str(Decimal(str(col))).split(".")[1])
-                if dec <= 2: fmt = "%8.2f"
-                else: fmt = f"%8.{dec}f"
-                s += fmt % col
-            s += '\n'
+        if self._template is None: self._build_template()
+        if self._pending is not None:
+            for name, value in zip(self.prms['Parm'].values, self._pending):
+                if name not in self._positions: continue
+                line, field, fmt = self._positions[name]
+                self._template[line][field] = fmt(value)
 
         with open(path, 'w') as file:
-            np.savetxt(file, PARM1_data[:-3], fmt='%8.2f%8.2f')
-            file.write('\n')
-            np.savetxt(file, PARM1_data[-2:], fmt='%8.2f%8.2f')
-            file.write(s)
+            file.write(''.join([''.join(fields) for fields in self._template]))
 
     def edit(self, values):
         """
         Updates the parameters in the DataFrame with new values.
         """
-        cols = self.prms['Parm'].values
-        self.data.loc[0, cols] = values
+        self._pending = np.asarray(values, dtype=float)
         
     @property
     def current(self):
         """
         Returns the current values of parameters in the DataFrame.
         """
+        self._flush()
         cols = self.prms['Parm'].values
-        return self.data.loc[0, cols]
+        return self._data.loc[0, cols]
 
     def set_sensitive(self, df_paths, all=False):
         """
@@ -236,6 +361,7 @@ class ieParm:
             # Filter parameters where 'Select' is True
             prms = prms[prms['Select'] == 1]
             prms['Range'] = prms.apply(lambda x: (x['Min'], x['Max']), axis=1)
+        self._flush()
         self.prms = prms.copy() 
         
     def constraints(self):
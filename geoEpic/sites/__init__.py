@@ -1 +1 @@
-from .main import *
\ No newline at end of file
+from .generate import format_sites, write_sites, existing_sites
\ No newline at end of file
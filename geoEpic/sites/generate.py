@@ -7,98 +7,173 @@ import argparse
 import geopandas as gpd
 from geoEpic.io import ConfigParser
 
-
-parser = argparse.ArgumentParser(description="Generate Site files.")
-parser.add_argument("-c", "--config", default= "./config.yml", help="Path to the configuration file")
-
-# parser.add_argument("-o", "--out_dir", type=str, required=True, help="Output directory to save results.")
-# parser.add_argument("-i", "--info_file", type=str, required=True, help="Path to the info file.")
-# parser.add_argument("-ele", "--elevation", type=str, required=True, help="Path to the elevation.tif")
-# parser.add_argument("-slope", "--slope", type=str, required=True, help="Path to the slope.tif")
-# parser.add_argument("-sl", "--slope_len", type=str, required=True, help="Path to the slope_len.csv")
-args = parser.parse_args()
-
-config = ConfigParser(args.config)
-
-site = config["site"]
-
-out_dir = site['dir']
-info_file = config['run_info']
-elevation = site['elevation']
-slope = site['slope']
-slope_len = site['slope_length']
-
-if info_file.lower().endswith('.csv'):
-    data = pd.read_csv(info_file)
-    required_columns_csv = {'SiteID', 'soil', 'lat', 'lon'}
-    if not required_columns_csv.issubset(set(data.columns)):
-        raise ValueError("CSV file missing one or more required columns: 'SiteID', 'soil', 'lat', 'lon'")
-elif info_file.lower().endswith('.shp'):
-    data = gpd.read_file(info_file)
-    data = data.to_crs(epsg=4326)  # Convert to latitude and longitude projection
-    data['lat'] = data.geometry.centroid.y
-    data['lon'] = data.geometry.centroid.x
-    required_columns_shp = {'SiteID', 'soil'}
-    if not required_columns_shp.issubset(set(data.columns)):
-        raise ValueError("Shapefile missing one or more required attributes: 'SiteID', 'soil'")
-    data.drop(columns=['geometry'], inplace=True)
-else:
-    raise ValueError("Unsupported file format. Please provide a '.csv' or '.shp' file.")
-
-info = data
-coords = info[['lon', 'lat']].values
-
-prefix = f'{os.path.dirname(__file__)}'
-
-info['ele'] = sample_raster_nearest(elevation, coords)['band_1']
-info['slope'] = sample_raster_nearest(slope, coords)['band_1']
-
-info = info.fillna(0)
-info['ssu'] = info['soil'].astype(int)
-info['slope_steep'] = round(info['slope'] / 100, 2)
-info['ele'] = round(info['ele'], 2)
-# print()
-# Check if slope_len is a TIFF file or a CSV file
-if slope_len.lower().endswith('.tif') or slope_len.lower().endswith('.tiff'):
-    # Sample raster data for slope length
-    slope_len_data = sample_raster_nearest(slope_len, coords)
-    # Add slope length data directly to the info DataFrame
-    info['slopelen_1'] = slope_len_data['band_1']  # Adjust 'band_1' as necessary
-elif slope_len.lower().endswith('.csv'):
-    # Read CSV file for slope length
-    slope_len_df = pd.read_csv(slope_len)
-    slope_len_df = slope_len_df[['mukey', 'slopelen_1']]
-    slope_len_df['mukey'] = slope_len_df['mukey'].astype(int)
-    slope_len_df['slopelen_1'] = slope_len_df['slopelen_1'].astype(float)
-    # Merge the slope length data with the info DataFrame
-    info = pd.merge(info, slope_len_df, how='left', left_on='ssu', right_on='mukey')
-else:
-    raise ValueError("Unsupported file format for slope_len. Expected .tif or .csv")
-
-print("writing site files")
-#site template
-with open(f"{prefix}/template.sit", 'r') as f:
-    template = f.readlines()
-
-
-os.makedirs(out_dir, exist_ok=True)
-def write_site(row):
-    with open(os.path.join(out_dir, f"{int(row['SiteID'])}.SIT"), 'w') as f:
-        # Modify the template lines
-        template[0] = 'USA crop simulations\n'
-        template[1] = 'Prototype\n'
-        template[2] = f'ID: {int(row["SiteID"])}\n'
-        template[3] = f'{row["lat"]:8.2f}{row["lon"]:8.2f}{row["ele"]:8.2f}{template[3][24:]}'  # This will replace the first 24 characters
-        template[4] = f'{template[4][:48]}{row["slopelen_1"]:8.2f}{row["slope_steep"]:8.2f}{template[4][64:]}'  # This will replace characters 49 to 64
-        template[6] = '                                                   \n'
-        # Write the modified template to the new file
-        f.writelines(template)
-
-existing_sites = [int(f.split('.')[0]) for f in os.listdir(out_dir)]
-info = info[~info['SiteID'].isin(existing_sites)]
-
-info_ls = info.to_dict('records')
-# print(info_ls)
-# write_site(info_ls[0])
-if( len(info_ls)>0 ):
-    parallel_executor(write_site, info_ls, max_workers = 80)
\ No newline at end of file
+def format_sites(info, template):
+    """
+    Formats the SIT files of all sites at once.
+
+    Args:
+        info (pd.DataFrame): Sites with 'SiteID', 'lat', 'lon', 'ele', 'slopelen_1' and 'slope_steep'.
+        template (list): Lines of the SIT template.
+
+    Returns:
+        np.ndarray: The text of each site's SIT file.
+    """
+    def fmt(column):
+        return np.char.mod('%8.2f', info[column].values.astype(float))
+
+    ids = info['SiteID'].values.astype(int).astype(str)
+    head = 'USA crop simulations\nPrototype\n'
+    tail = template[5] + '                                                   \n' + ''.join(template[7:])
+    text = np.char.add(head + 'ID: ', ids)
+    # Line 4 replaces the first 24 characters, line 5 characters 49 to 64 of the template
+    for part in ('\n', fmt('lat'), fmt('lon'), fmt('ele'), template[3][24:], template[4][:48],
+                 fmt('slopelen_1'), fmt('slope_steep'), template[4][64:] + tail):
+        text = np.char.add(text, part)
+    return text
+
+
+def _write_files(chunk):
+    for path, text in chunk:
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+def _index_path(out_dir):
+    return os.path.normpath(out_dir) + '.index'
+
+
+def existing_sites(out_dir):
+    """
+    Returns the SiteIDs with a SIT file in 'out_dir'.
+
+    The IDs are read from an index file next to 'out_dir', which is trusted while the folder
+    has not been modified since it was written; otherwise the folder is listed again.
+    """
+    index = _index_path(out_dir)
+    mtime = os.stat(out_dir).st_mtime_ns
+    if os.path.exists(index):
+        with open(index) as f:
+            lines = f.read().split()
+        if lines and lines[0] == str(mtime):
+            return set(map(int, lines[1:]))
+    sites = set()
+    for f in os.listdir(out_dir):
+        name, ext = os.path.splitext(f)
+        if ext.lower() == '.sit' and name.isdigit():
+            sites.add(int(name))
+    _save_index(out_dir, sites)
+    return sites
+
+
+def _save_index(out_dir, sites):
+    index = _index_path(out_dir)
+    with open(index + '.tmp', 'w') as f:
+        f.write('\n'.join([str(os.stat(out_dir).st_mtime_ns)] + [str(site) for site in sorted(sites)]))
+    os.replace(index + '.tmp', index)
+
+
+def write_sites(info, out_dir, template, max_workers = 16, chunk_size = 1000):
+    """
+    Writes the SIT files of sites not yet in 'out_dir', from a bounded thread pool.
+
+    Args:
+        info (pd.DataFrame): Sites, as required by 'format_sites'.
+        out_dir (str): Folder of the SIT files.
+        template (list): Lines of the SIT template.
+        max_workers (int): Number of threads writing files.
+        chunk_size (int): Number of files written by each task.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sites = existing_sites(out_dir)
+    info = info[~info['SiteID'].astype(int).isin(sites)]
+    if info.empty: return
+
+    ids = info['SiteID'].values.astype(int)
+    paths = [os.path.join(out_dir, f"{site_id}.SIT") for site_id in ids]
+    pairs = list(zip(paths, format_sites(info, template)))
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+    _, failed = parallel_executor(_write_files, chunks, method='Thread', max_workers=max_workers)
+
+    written = set(ids)
+    for i in failed:
+        written -= {int(os.path.splitext(os.path.basename(path))[0]) for path, _ in chunks[i]}
+    _save_index(out_dir, sites | written)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Generate Site files.")
+    parser.add_argument("-c", "--config", default= "./config.yml", help="Path to the configuration file")
+
+    # parser.add_argument("-o", "--out_dir", type=str, required=True, help="Output directory to save results.")
+    # parser.add_argument("-i", "--info_file", type=str, required=True, help="Path to the info file.")
+    # parser.add_argument("-ele", "--elevation", type=str, required=True, help="Path to the elevation.tif")
+    # parser.add_argument("-slope", "--slope", type=str, required=True, help="Path to the slope.tif")
+    # parser.add_argument("-sl", "--slope_len", type=str, required=True, help="Path to the slope_len.csv")
+    args = parser.parse_args(argv)
+
+    config = ConfigParser(args.config)
+
+    site = config["site"]
+
+    out_dir = site['dir']
+    info_file = config['run_info']
+    elevation = site['elevation']
+    slope = site['slope']
+    slope_len = site['slope_length']
+
+    if info_file.lower().endswith('.csv'):
+        data = pd.read_csv(info_file)
+        required_columns_csv = {'SiteID', 'soil', 'lat', 'lon'}
+        if not required_columns_csv.issubset(set(data.columns)):
+            raise ValueError("CSV file missing one or more required columns: 'SiteID', 'soil', 'lat', 'lon'")
+    elif info_file.lower().endswith('.shp'):
+        data = gpd.read_file(info_file)
+        data = data.to_crs(epsg=4326)  # Convert to latitude and longitude projection
+        data['lat'] = data.geometry.centroid.y
+        data['lon'] = data.geometry.centroid.x
+        required_columns_shp = {'SiteID', 'soil'}
+        if not required_columns_shp.issubset(set(data.columns)):
+            raise ValueError("Shapefile missing one or more required attributes: 'SiteID', 'soil'")
+        data.drop(columns=['geometry'], inplace=True)
+    else:
+        raise ValueError("Unsupported file format. Please provide a '.csv' or '.shp' file.")
+
+    info = data
+    coords = info[['lon', 'lat']].values
+
+    prefix = f'{os.path.dirname(__file__)}'
+
+    info['ele'] = sample_raster_nearest(elevation, coords)['band_1']
+    info['slope'] = sample_raster_nearest(slope, coords)['band_1']
+
+    info = info.fillna(0)
+    info['ssu'] = info['soil'].astype(int)
+    info['slope_steep'] = round(info['slope'] / 100, 2)
+    info['ele'] = round(info['ele'], 2)
+    # print()
+    # Check if slope_len is a TIFF file or a CSV file
+    if slope_len.lower().endswith('.tif') or slope_len.lower().endswith('.tiff'):
+        # Sample raster data for slope length
+        slope_len_data = sample_raster_nearest(slope_len, coords)
+        # Add slope length data directly to the info DataFrame
+        info['slopelen_1'] = slope_len_data['band_1']  # Adjust 'band_1' as necessary
+    elif slope_len.lower().endswith('.csv'):
+        # Read CSV file for slope length
+        slope_len_df = pd.read_csv(slope_len)
+        slope_len_df = slope_len_df[['mukey', 'slopelen_1']]
+        slope_len_df['mukey'] = slope_len_df['mukey'].astype(int)
+        slope_len_df['slopelen_1'] = slope_len_df['slopelen_1'].astype(float)
+        # Merge the slope length data with the info DataFrame
+        info = pd.merge(info, slope_len_df, how='left', left_on='ssu', right_on='mukey')
+    else:
+        raise ValueError("Unsupported file format for slope_len. Expected .tif or .csv")
+
+    print("writing site files")
+    #site template
+    with open(f"{prefix}/template.sit", 'r') as f:
+        template = f.readlines()
+
+    write_sites(info, out_dir, template)
+
+if __name__ == '__main__':
+    main()
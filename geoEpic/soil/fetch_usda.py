@@ -1,6 +1,7 @@
-from utils import write_soil_file
+from geoEpic.soil.utils import write_soil_file, get_ssurgo_mukeys
+import numpy as np
 import pandas as pd
-from sda import SoilDataAccess
+from geoEpic.soil.sda import SoilDataAccess
 import geopandas as gpd
 import os
 import argparse
@@ -34,42 +35,119 @@ def fetch_data(input_data, output_dir, raw):
         
         
 
-def fetch_list(input_data, output_dir, raw):
+def read_locations(input_data):
     """
-    Fetches soil data based on the input type which could be coordinates, a CSV file, or a shapefile.
+    Reads point locations from a CSV file (with 'lat'/'lon' or 'latitude'/'longitude' columns)
+    or a shapefile (using polygon centroids).
 
-    Args:
-        input_data (str): Could be latitude and longitude as a string, path to a CSV file, or path to a shapefile.
-        output_dir (str): Directory or file path where the output should be saved.
-        raw (bool): Whether to save the results as raw CSV or .SOL file.
+    Returns:
+        pd.DataFrame: The input rows with 'lon' and 'lat' columns.
     """
     if input_data.endswith('.csv'):
         locations = pd.read_csv(input_data)
-        point_strings = [f"point({row.latitude} {row.longitude})" for _, row in locations.iterrows()]
-        parallel_executor(fetch_data, point_strings, output_dir, raw)
-    elif input_data.endswith('.shp'):
-        shapefile = gpd.read_file(input_data)
-        shapefile['centroid'] = shapefile.geometry.centroid
-        locations = shapefile['centroid'].apply(lambda x: f'point({x.x} {x.y})')
-        parallel_executor(fetch_data, locations, output_dir, raw)
+        if 'lat' not in locations.columns:
+            locations = locations.rename(columns={'latitude': 'lat', 'longitude': 'lon'})
     else:
-       fetch_data(input_data, output_dir, raw)
+        locations = gpd.read_file(input_data).to_crs(epsg=4326)
+        centroids = locations.geometry.centroid
+        locations = pd.DataFrame(locations.drop(columns='geometry'))
+        locations['lon'], locations['lat'] = centroids.x, centroids.y
+    return locations
+
+
+def resolve_mukeys(locations, soil_map = None, max_workers = 8):
+    """
+    Finds the mukey at each location, locally from the SSURGO raster if given, otherwise
+    with one Soil Data Access request per distinct location.
+
+    Args:
+        locations (pd.DataFrame): Locations with 'lon' and 'lat' columns.
+        soil_map (str, optional): Path to the gSSURGO mukey raster, in any CRS.
+        max_workers (int): Number of concurrent requests without a soil map.
+
+    Returns:
+        np.ndarray: The mukey of each location, 0 where none was found.
+    """
+    coords = locations[['lon', 'lat']].values
+    if soil_map is not None:
+        import rasterio
+        with rasterio.open(soil_map) as src:
+            nodata = src.nodata
+        mukeys = np.asarray(get_ssurgo_mukeys(coords, soil_map, crs='EPSG:4326'), dtype=np.int64)
+        if nodata is not None: mukeys[mukeys == int(nodata)] = 0
+        return mukeys
+
+    unique, inverse = np.unique(coords, axis=0, return_inverse=True)
+    wkts = [f'point({lon} {lat})' for lon, lat in unique]
+    mukeys, failed = parallel_executor(SoilDataAccess.get_mukey, wkts, method='Thread',
+                                       max_workers=max_workers, return_value=True)
+    mukeys = np.array([0 if mukey is None else int(mukey) for mukey in mukeys], dtype=np.int64)
+    return mukeys[inverse.ravel()]
+
+
+def fetch_list(input_data, output_dir, raw, soil_map = None, info_path = None):
+    """
+    Fetches soil data based on the input type which could be a CSV file or a shapefile.
+
+    Locations are first resolved to mukeys and deduplicated, so the properties of each map
+    unit are fetched (in batches) and written once, whatever the number of sites using it.
+
+    Args:
+        input_data (str): Path to a CSV file or a shapefile.
+        output_dir (str): Directory or file path where the output should be saved.
+        raw (bool): Whether to save the results as raw CSV or .SOL file.
+        soil_map (str, optional): Path to the gSSURGO mukey raster used to resolve locations locally.
+        info_path (str, optional): CSV to save the locations with their mukey in a 'soil' column.
+
+    Returns:
+        dict: Number of locations, unique mukeys, the dedup ratio and mukeys without data.
+    """
+    locations = read_locations(input_data)
+    mukeys = resolve_mukeys(locations, soil_map)
+    # Locations without a map unit (nodata of the soil map or no SDA match) are 0
+    unique = np.unique(mukeys[mukeys != 0])
+    report = {'locations': len(locations), 'mukeys': len(unique),
+              'dedup_ratio': len(locations) / max(len(unique), 1)}
+    print(f"{report['locations']} locations map to {report['mukeys']} unique mukeys "
+          f"(dedup ratio {report['dedup_ratio']:.1f}x)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    extension = 'csv' if raw else 'SOL'
+    pending = [mukey for mukey in unique if not os.path.exists(os.path.join(output_dir, f"{mukey}.{extension}"))]
+    soil_df = SoilDataAccess.fetch_properties_batch(pending)
+    written = set()
+    for mukey, df in (soil_df.groupby('mukey') if not soil_df.empty else []):
+        if raw:
+            df.to_csv(os.path.join(output_dir, f"{mukey}.csv"), index=False)
+        else:
+            write_soil_file(df, output_dir)
+        written.add(mukey)
+    report['missing'] = sorted(set(pending) - written)
+    if report['missing']:
+        print(f"No soil data found for {len(report['missing'])} mukeys")
+
+    if info_path is not None:
+        locations['soil'] = mukeys
+        locations.to_csv(info_path, index=False)
+    return report
         
         
-def main():
+def main(argv = None):
     parser = argparse.ArgumentParser(description="Fetch and output data from USDA SSURGO")
     parser.add_argument('--fetch', metavar='INPUT', nargs='+', help='Latitude and longitude as two floats, or a file path')
     parser.add_argument('--out', default='./', dest='output_path', help='Output directory or file path for the fetched data')
     parser.add_argument('--raw', action='store_true', help='Save results as raw CSV instead of .SOL file')
+    parser.add_argument('--soil_map', default=None, help='gSSURGO mukey raster to resolve file locations locally')
+    parser.add_argument('--info', default=None, dest='info_path', help="CSV to save file locations with their 'soil' mukey")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     if len(args.fetch) == 2:
         latitude, longitude = map(float, args.fetch)
         wkt = f'point({longitude} {latitude})'
         fetch_data(wkt, args.output_path, args.raw)
     else:
-        fetch_list(args.fetch[0], args.output_path, args.raw)
+        fetch_list(args.fetch[0], args.output_path, args.raw, args.soil_map, args.info_path)
 
 
 
@@ -1,9 +1,38 @@
-import requests
+import os
+import io
 import json
+import sqlite3
+import requests
+import numpy as np
 import pandas as pd
 
 class SoilDataAccess:
     BASE_URL = "https://sdmdataaccess.nrcs.usda.gov/Tabular/SDMTabularService/post.rest"
+    # Default location of the on-disk cache of soil properties, keyed by mukey
+    CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'geoEpic', 'sda_properties.sqlite')
+    # Map units per IN (...) query, keeping responses well under the service's row and time limits
+    CHUNK_SIZE = 200
+    TIMEOUT = 120
+
+    _session = None
+    _session_pid = None
+
+    @classmethod
+    def session(cls):
+        """
+        Returns a pooled requests.Session retrying failed requests with exponential backoff.
+        A new session is created in each process, since sessions are not fork safe.
+        """
+        if cls._session is None or cls._session_pid != os.getpid():
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            retry = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                          allowed_methods=None, respect_retry_after_header=True)
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(max_retries=retry, pool_maxsize=16))
+            session.mount('http://', HTTPAdapter(max_retries=retry, pool_maxsize=16))
+            cls._session, cls._session_pid = session, os.getpid()
+        return cls._session
 
     @staticmethod
     def query(query):
@@ -26,7 +55,8 @@ class SoilDataAccess:
         }
         
         try:
-            response = requests.post(url=SoilDataAccess.BASE_URL, json=request_params)
+            response = SoilDataAccess.session().post(url=SoilDataAccess.BASE_URL, json=request_params,
+                                                     timeout=SoilDataAccess.TIMEOUT)
             response.raise_for_status()  # Check for HTTP errors
         except requests.RequestException as e:
             raise requests.RequestException(f"Network error occurred: {e}")
@@ -137,6 +167,7 @@ class SoilDataAccess:
     def fetch_properties(input_value):
         """
         Fetches soil data based on the input value. If the input is an integer, it is used as mukey. If the input is a string, it is used as WKT.
+        Map units given by mukey are read from and added to the on-disk cache.
 
         Args:
         input (int or str): The input value representing either a mukey (int) or a WKT location (str).
@@ -144,7 +175,71 @@ class SoilDataAccess:
         Returns:
         pd.DataFrame: A DataFrame containing the soil data for the specified input.
         """
-        query = f''' 
+        if isinstance(input_value, (int, np.integer)) and not isinstance(input_value, bool):
+            soil_df = SoilDataAccess.fetch_properties_batch([input_value])
+            if soil_df.empty:
+                raise ValueError("No data found for the provided query.")
+            return soil_df
+        merged = SoilDataAccess.query(SoilDataAccess._properties_query(SoilDataAccess._mukey_condition(input_value)))
+        return SoilDataAccess._soil_properties(merged)
+
+    @staticmethod
+    def fetch_properties_batch(mukeys, cache_path = None, chunk_size = None, max_workers = 4):
+        """
+        Fetches soil data for many map units, with one 'WHERE mukey IN (...)' query per chunk of mukeys.
+
+        Map units already in the cache are not requested again, including those for which the
+        service returned no data.
+
+        Args:
+        mukeys (list of int): The map unit keys.
+        cache_path (str or bool, optional): Path of the sqlite cache. Defaults to 'SoilDataAccess.CACHE_PATH';
+            False disables caching.
+        chunk_size (int, optional): Map units per query. Defaults to 'SoilDataAccess.CHUNK_SIZE'.
+        max_workers (int): Number of concurrent queries.
+
+        Returns:
+        pd.DataFrame: The soil data of all map units found, as returned by 'fetch_properties'.
+        """
+        from geoEpic.utils import parallel_executor
+        mukeys = sorted({int(mukey) for mukey in mukeys})
+        chunk_size = chunk_size or SoilDataAccess.CHUNK_SIZE
+        cache = _PropertyCache(SoilDataAccess.CACHE_PATH if cache_path is None else cache_path) \
+            if cache_path is not False else None
+
+        found = cache.get(mukeys) if cache else {}
+        missing = [mukey for mukey in mukeys if mukey not in found]
+        chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+        if chunks:
+            results, failed = parallel_executor(SoilDataAccess._fetch_chunk, chunks, method='Thread',
+                                                max_workers=max_workers, return_value=True, bar=len(chunks) > 1)
+            for i, soil_df in enumerate(results):
+                if i in failed: continue
+                fetched = {mukey: df for mukey, df in soil_df.groupby('mukey')}
+                fetched.update({mukey: soil_df.iloc[:0] for mukey in chunks[i] if mukey not in fetched})
+                if cache: cache.put(fetched)
+                found.update(fetched)
+
+        frames = [found[mukey] for mukey in mukeys if mukey in found]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _fetch_chunk(mukeys):
+        """Fetches soil data for a list of mukeys, returning an empty DataFrame if none is found."""
+        condition = ', '.join(f"'{mukey}'" for mukey in mukeys)
+        try:
+            merged = SoilDataAccess.query(SoilDataAccess._properties_query(condition))
+        except ValueError as e:
+            if 'No data found' not in str(e): raise
+            return pd.DataFrame(columns=['mukey'])
+        return SoilDataAccess._soil_properties(merged)
+
+    @staticmethod
+    def _properties_query(mukey_condition):
+        """Returns the SQL query of soil properties for map units selected by 'mukey_condition'."""
+        return f''' 
         SELECT DISTINCT mu.mukey,co.cokey,ch.chkey,mu.musym, desgnvert,hzdepb_r,dbthirdbar_r,
         wfifteenbar_r,wthirdbar_r,sandtotal_r,silttotal_r,ph1to1h2o_r,awc_r,sumbases_r,om_r,
         caco3_r,cec7_r,sieveno10_r,fraggt10_r,frag3to10_r,dbovendry_r,ksat_r,compname,hydgrp,
@@ -153,7 +248,7 @@ class SoilDataAccess:
         LEFT JOIN legend lg ON sc.areasymbol = lg.areasymbol
         LEFT JOIN (
         SELECT * FROM mapunit
-        WHERE mukey in ({SoilDataAccess._mukey_condition(input_value)})
+        WHERE mukey in ({mukey_condition})
         ) mu ON lg.lkey = mu.lkey
         LEFT JOIN component co ON mu.mukey = co.mukey
         LEFT JOIN chorizon ch ON co.cokey = ch.cokey
@@ -161,8 +256,10 @@ class SoilDataAccess:
         AND compkind='Series'
         AND wthirdbar_r > 0
         '''
-        merged = SoilDataAccess.query(query)
 
+    @staticmethod
+    def _soil_properties(merged):
+        """Converts the rows of a properties query to EPIC soil layers."""
         merged['hydgrp'] = merged['hydgrp'].replace('', 'C').fillna('C').str.slice(stop=1)
         merged['Hydgrp_conv'] = merged['hydgrp'].map({'A': 1, 'B': 2, 'C': 3, 'D': 4})
         for col in merged.columns:
@@ -280,3 +377,36 @@ class SoilDataAccess:
         return result
 
 
+class _PropertyCache:
+    """
+    Soil properties of map units stored in sqlite, one row per mukey.
+    Map units without data are stored with an empty table so they are not requested again.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS properties (mukey INTEGER PRIMARY KEY, data TEXT)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        return conn
+
+    def get(self, mukeys):
+        """Returns a dict of mukey to DataFrame for the cached mukeys."""
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(mukeys), 500):
+                chunk = mukeys[i:i + 500]
+                rows = conn.execute(f"SELECT mukey, data FROM properties WHERE mukey IN ({','.join('?' * len(chunk))})",
+                                    chunk).fetchall()
+                for mukey, data in rows:
+                    found[mukey] = pd.read_json(io.StringIO(data), orient='table')
+        return found
+
+    def put(self, frames):
+        """Stores a dict of mukey to DataFrame."""
+        rows = [(int(mukey), df.reset_index(drop=True).to_json(orient='table', index=False)) for mukey, df in frames.items()]
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO properties (mukey, data) VALUES (?, ?)", rows)
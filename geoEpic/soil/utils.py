@@ -1,45 +1,177 @@
 import os
 import subprocess
-from geoEpic.utils import find_nearest, raster_to_dataframe
+import numpy as np
     
-def get_ssurgo_mukeys(coords, ssurgo_map, files_dir=None):
-    ssurgo = raster_to_dataframe(ssurgo_map)
+def get_ssurgo_mukeys(coords, ssurgo_map, files_dir=None, crs=None):
+    """
+    Find the SSURGO map unit key at each coordinate.
+
+    Only the raster blocks containing coordinates are read. Where the pixel is nodata, or
+    its mukey has no SOL file in 'files_dir', the nearest valid pixel around it is used.
+
+    Args:
+        coords (array-like): Array of (x, y) coordinates.
+        ssurgo_map (str): Path to the gSSURGO mukey raster.
+        files_dir (str, optional): Folder of SOL files named by mukey.
+        crs (str, optional): The CRS of the coords, e.g. 'EPSG:4326'. Defaults to the CRS of 'ssurgo_map'.
+
+    Returns:
+        np.ndarray: The mukey for each coordinate.
+    """
+    from geoEpic.utils import sample_raster_valid
+    is_valid = None
     if files_dir is not None:
-        soil_list = [int(f.split('.')[0]) for f in os.listdir(files_dir)]
-        ssurgo = ssurgo[ssurgo['band_1'].isin(soil_list)]
-    inds = find_nearest(coords, ssurgo[['lon', 'lat']].values)
-    soil_ids = (ssurgo['band_1'].values)[inds]
-    return soil_ids
+        soil_list = np.array([int(f.split('.')[0]) for f in os.listdir(files_dir)])
+        is_valid = lambda values: np.isin(values, soil_list)
+    return sample_raster_valid(ssurgo_map, coords, is_valid, crs=crs)
 
 
 def write_soil_file(soil_df, outdir, header = None, template_orig = None):
     if template_orig is not None:
-        template = template_orig.copy()
+        template = template_orig
     else:
-        with open(f'{os.path.dirname(__file__)}/template.sol', 'r') as file:
-            template = file.readlines()
+        template = _read_template()
 
     if header is None: header = soil_df.iloc[0]
     mukey = int(header['mukey'])
+    soil_layer_key = soil_df[soil_df['mukey'] == mukey]
+    soil_layer_key = soil_layer_key.sort_values(by = ['Layer_depth'])
+    values = _format_values(soil_layer_key.iloc[:, 2:21].values, 3)
+    lines = _soil_lines(template, mukey, header['albedo'], header['hydgrp_conv'], values,
+                        decimals = 3, pad_to = 45, horizon = False)
     with open(os.path.join(outdir, f"{mukey}.SOL"), 'w+') as file:
-        soil_layer_key = soil_df[soil_df['mukey'] == mukey]
-        soil_layer_key = soil_layer_key.sort_values(by = ['Layer_depth'])
-        len_cols = len(soil_layer_key)
-        
-        # Generate first three lines of the file
-        template[0] = f"ID: {mukey}\n"
-        template[1] = '{:8.3f}{:8.3f}'.format(header['albedo'], header['hydgrp_conv']) + template[1][16:]
-        template[2] = '{:8.3f}'.format(len_cols + 1) + template[2][8:]
-        
-        # Generate lines for each row in soil_layer_key dataframe
-        vals = (soil_layer_key.iloc[:, 2:21].values).T
-        len_rows = len(vals) 
-        for i in range(len_rows):
-            template[3 + i] = ''.join([f'{val:8.3f}' for val in vals[i]]) + '\n'
-    
-        # Fill remaining lines with padding
-        padding = ['{:8.3f}'.format(0) for _ in range(23)]
-        for i in range(len_rows + 3, 45):
-            template[i] = ''.join(padding[:len_cols]) + '\n'
-        
-        file.writelines(template)
\ No newline at end of file
+        file.writelines(lines)
+
+
+def write_soil_files(soil_layer, soils, outdir = None, archive = None, max_workers = 20, chunk_size = 1000):
+    """
+    Write the SOL files of many map units at once.
+
+    Layers are sorted by mukey and split into one block per map unit, and all values are
+    formatted in a single vectorised pass. Files are then written by a process pool, or
+    packed into a single zip archive (one '<mukey>.SOL' member each) to avoid creating
+    100k+ small files; see 'extract_soil_files'.
+
+    Args:
+        soil_layer (pd.DataFrame): One row per layer, with 'mukey', 'Layer_depth' and the 19 layer
+            properties in columns 2 to 20, as built by ssurgo_gdb.
+        soils (pd.DataFrame): One row per map unit, with 'mukey', 'albedo' and 'hydgrp_conv'.
+        outdir (str, optional): Folder to write the SOL files to.
+        archive (str, optional): Path of a zip archive to write instead of separate files.
+        max_workers (int): Number of processes writing files.
+        chunk_size (int): Number of map units written by each task.
+    """
+    from geoEpic.utils import parallel_executor
+    if (outdir is None) == (archive is None):
+        raise ValueError("Exactly one of 'outdir' or 'archive' must be given.")
+
+    template = _read_template()
+    layers = soil_layer[soil_layer['mukey'].isin(soils['mukey'])]
+    layers = layers.sort_values(by = ['mukey', 'Layer_depth'], kind = 'stable')
+    mukeys = layers['mukey'].values
+    values = _format_values(layers.iloc[:, 2:21].values, 2)
+    starts = np.flatnonzero(np.r_[True, mukeys[1:] != mukeys[:-1]]) if len(mukeys) else np.empty(0, dtype=int)
+    blocks = dict(zip(mukeys[starts], np.split(values, starts[1:])))
+
+    empty = values[:0]
+    units = [(int(mukey), albedo, hydgrp, blocks.get(mukey, empty))
+             for mukey, albedo, hydgrp in soils[['mukey', 'albedo', 'hydgrp_conv']].itertuples(index = False)]
+    tasks = [(template, units[i:i + chunk_size], outdir) for i in range(0, len(units), chunk_size)]
+    if not tasks: return
+
+    if outdir is not None:
+        os.makedirs(outdir, exist_ok = True)
+        parallel_executor(_write_soil_chunk, tasks, max_workers = max_workers)
+        return
+
+    import zipfile
+    texts, _ = parallel_executor(_write_soil_chunk, tasks, max_workers = max_workers, return_value = True)
+    with zipfile.ZipFile(archive, 'w', compression = zipfile.ZIP_DEFLATED) as zf:
+        for chunk in texts:
+            for name, text in chunk or []:
+                zf.writestr(name, text)
+
+
+def extract_soil_files(archive, outdir, mukeys = None):
+    """
+    Extract SOL files from an archive written by 'write_soil_files'.
+
+    Args:
+        archive (str): Path to the zip archive.
+        outdir (str): Folder to extract the SOL files to.
+        mukeys (list, optional): Map units to extract. Defaults to all of them.
+
+    Returns:
+        list: The mukeys missing from the archive.
+    """
+    import zipfile
+    os.makedirs(outdir, exist_ok = True)
+    with zipfile.ZipFile(archive) as zf:
+        names = set(zf.namelist())
+        wanted = names if mukeys is None else {f"{int(mukey)}.SOL" for mukey in mukeys}
+        for name in wanted & names:
+            with open(os.path.join(outdir, name), 'wb') as file:
+                file.write(zf.read(name))
+    return sorted(int(name.split('.')[0]) for name in wanted - names)
+
+
+def _write_soil_chunk(task):
+    """Writes the SOL files of a chunk of map units, or returns (file name, text) pairs if 'outdir' is None."""
+    template, units, outdir = task
+    texts = []
+    for mukey, albedo, hydgrp, values in units:
+        text = ''.join(_soil_lines(template, mukey, albedo, hydgrp, values))
+        if outdir is None:
+            texts.append((f"{mukey}.SOL", text))
+        else:
+            with open(os.path.join(outdir, f"{mukey}.SOL"), 'w') as file:
+                file.write(text)
+    return texts
+
+
+def _read_template():
+    with open(f'{os.path.dirname(__file__)}/template.sol', 'r') as file:
+        return file.readlines()
+
+
+def _format_values(values, decimals):
+    """Formats an array of layer properties as 8 character strings."""
+    return np.char.mod(f'%8.{decimals}f', np.asarray(values, dtype = float))
+
+
+def _soil_lines(template, mukey, albedo, hydgrp, values, decimals = 2, pad_to = 51, horizon = True):
+    """
+    Fill the SOL template for one map unit.
+
+    Args:
+        template (list): Lines of the SOL template.
+        values (np.ndarray): Formatted layer properties, one row per layer.
+        decimals (int): Decimals of the header values and padding.
+        pad_to (int): Line up to which unused property lines are padded with zeros.
+        horizon (bool): Whether to set the horizon line to 'A' for each layer.
+
+    Returns:
+        list: Lines of the SOL file.
+    """
+    lines = template.copy()
+    n_layers = len(values)
+    zero = '{:8.{}f}'.format(0, decimals)
+
+    # Generate first three lines of the file
+    lines[0] = f"ID: {mukey}\n"
+    lines[1] = '{:8.{d}f}{:8.{d}f}'.format(albedo, hydgrp, d = decimals) + template[1][16:]
+    lines[2] = '{:8.{}f}'.format(n_layers + 1, decimals) + template[2][8:]
+
+    # One line per property, one column per layer
+    n_rows = values.shape[1]
+    for i, row in enumerate(values.T):
+        lines[3 + i] = ''.join(row) + '\n'
+
+    # Fill remaining lines with padding
+    for i in range(n_rows + 3, pad_to):
+        lines[i] = zero * n_layers + '\n'
+
+    # Fill soil horizon to 'A'
+    if horizon:
+        lines[47] = '       A' * n_layers + '\n'
+    return lines
@@ -1,3 +1,22 @@
 from .parallel import parallel_executor, delete_folder_files_in_parallel
-from .raster_utils import *
-from .misc import *
\ No newline at end of file
+from .misc import *
+import importlib
+
+# Raster helpers depend on GDAL, rasterio, geopandas and sklearn; import them on first use
+_lazy_attrs = {
+    'find_nearest': '.raster_utils',
+    'raster_to_dataframe': '.raster_utils',
+    'sample_raster_aggregated': '.raster_utils',
+    'sample_raster_nearest': '.raster_utils',
+    'sample_raster_valid': '.raster_utils',
+    'reproject_crop_raster': '.raster_utils',
+    'GeoInterface': '.raster_utils',
+}
+
+def __getattr__(name):
+    if name in _lazy_attrs:
+        return getattr(importlib.import_module(_lazy_attrs[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_attrs))
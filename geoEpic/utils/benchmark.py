@@ -0,0 +1,73 @@
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+
+
+def lookup_benchmark(n_points = 1_000_000, shape = (2900, 4600), sample = 2000, seed = 0):
+    """
+    Time GeoInterface.lookup_many against per-point lookups on a synthetic climate grid.
+
+    The grid mimics a ~1 km Daymet style 'climate_grid.tif' with cell ids as values and
+    NaN outside the area of interest.
+
+    Args:
+        n_points (int): Number of query points for lookup_many.
+        shape (tuple): Height and width of the grid in pixels.
+        sample (int): Number of points timed with the per-point lookup, extrapolated to n_points.
+        seed (int): Seed for the random query points.
+
+    Returns:
+        dict: Timings in seconds for building the interface, lookup_many and (extrapolated) lookup.
+    """
+    import rasterio
+    from rasterio.transform import from_origin
+    from geoEpic.utils import GeoInterface
+
+    height, width = shape
+    res = 0.00901
+    grid = np.arange(height * width, dtype='float64').reshape(shape)
+    rows, cols = np.ogrid[:height, :width]
+    grid[((rows - height / 2) / (height / 2)) ** 2 + ((cols - width / 2) / (width / 2)) ** 2 > 1] = np.nan
+
+    rng = np.random.default_rng(seed)
+    lats = 50 - rng.uniform(0, height * res, n_points)
+    lons = -125 + rng.uniform(0, width * res, n_points)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'climate_grid.tif')
+        with rasterio.open(path, 'w', driver='GTiff', height=height, width=width, count=1,
+                           dtype=grid.dtype, crs='EPSG:4326', transform=from_origin(-125, 50, res, res)) as dst:
+            dst.write(grid, 1)
+
+        start = time.perf_counter()
+        lookup = GeoInterface(path)
+        timings = {'init': time.perf_counter() - start}
+
+        start = time.perf_counter()
+        ids = lookup.lookup_many(lats, lons)
+        timings['lookup_many'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(sample):
+            if int(lookup.lookup(lats[i], lons[i])['band_1']) != ids[i]:
+                raise AssertionError(f"lookup and lookup_many disagree at point {i}")
+        timings['lookup'] = (time.perf_counter() - start) * n_points / sample
+    return timings
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Benchmark geoEpic lookups")
+    parser.add_argument("-n", "--n_points", type=int, default = 1_000_000, help="Number of query points")
+    parser.add_argument("-s", "--sample", type=int, default = 2000, help="Points timed with per-point lookup")
+    args = parser.parse_args(argv)
+
+    timings = lookup_benchmark(args.n_points, sample = args.sample)
+    print(f"GeoInterface on climate grid, {args.n_points} points")
+    print(f"    {'init':<24} {timings['init']:9.3f} s")
+    print(f"    {'lookup_many':<24} {timings['lookup_many']:9.3f} s")
+    print(f"    {'lookup (extrapolated)':<24} {timings['lookup']:9.3f} s")
+
+if __name__ == '__main__':
+    main()
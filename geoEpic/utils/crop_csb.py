@@ -82,17 +82,21 @@ def run_ogr2ogr(args):
 
     
 
-parser = argparse.ArgumentParser(description='Filter CSB GDB file to a specific region.')
-parser.add_argument('input_file', type=str, help='Input GDB file path')
-parser.add_argument('output_file', type=str, help='Output SHP file path')
-parser.add_argument('--center', type=str, help='Center latitude and longitude "lat,lon"')
-parser.add_argument('--extent', type=str, help='Extent height and width in km "hkm x wkm"')
-parser.add_argument('--bbox', type=str, help='Bounding box "minLon,minLat,maxLon,maxLat"')
-parser.add_argument('--state_fips', type=str, help='State FIPS code')
-parser.add_argument('--state_name', type=str, help='State name')
-parser.add_argument('--county_fips', type=str, help='County FIPS code')
-parser.add_argument('--county_name', type=str, help='County name followed by state name "County, State"')
+def main(argv = None):
+    parser = argparse.ArgumentParser(description='Filter CSB GDB file to a specific region.')
+    parser.add_argument('input_file', type=str, help='Input GDB file path')
+    parser.add_argument('output_file', type=str, help='Output SHP file path')
+    parser.add_argument('--center', type=str, help='Center latitude and longitude "lat,lon"')
+    parser.add_argument('--extent', type=str, help='Extent height and width in km "hkm x wkm"')
+    parser.add_argument('--bbox', type=str, help='Bounding box "minLon,minLat,maxLon,maxLat"')
+    parser.add_argument('--state_fips', type=str, help='State FIPS code')
+    parser.add_argument('--state_name', type=str, help='State name')
+    parser.add_argument('--county_fips', type=str, help='County FIPS code')
+    parser.add_argument('--county_name', type=str, help='County name followed by state name "County, State"')
 
-args = parser.parse_args()
+    args = parser.parse_args(argv)
 
-run_ogr2ogr(args)
+    run_ogr2ogr(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import sys
+import argparse
+import subprocess
+
+# Modules tracked by default, from the CLI entry point to the full toolkit
+default_modules = ['geoEpic', 'geoEpic.dispatcher', 'geoEpic.utils', 'geoEpic.io',
+                   'geoEpic.core', 'geoEpic.weather', 'geoEpic.soil']
+_marker = '-- geoEpic import start --'
+
+
+def measure_import(module, repeat = 3):
+    """
+    Measure the time to import a module in a fresh interpreter.
+
+    Args:
+        module (str): Name of the module to import.
+        repeat (int): Number of interpreters to start; the fastest import is kept.
+
+    Returns:
+        tuple: (seconds, slowest) with the import time and a list of (package, seconds)
+            for the slowest top-level imports, or (None, error message) if the import failed.
+    """
+    best, slowest = None, []
+    for _ in range(repeat):
+        code = (f'import sys, time; sys.stderr.write("{_marker}\\n"); sys.stderr.flush(); '
+                f't = time.perf_counter(); import {module}; print(time.perf_counter() - t)')
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            return None, proc.stderr.strip().splitlines()[-1]
+        seconds = float(proc.stdout.strip().splitlines()[-1])
+        if best is None or seconds < best:
+            best, slowest = seconds, _top_level_imports(proc.stderr)
+    return best, slowest
+
+
+def _top_level_imports(importtime_log, n = 5):
+    """Returns the 'n' slowest imports made directly by the measured module from a -X importtime log."""
+    entries = []
+    log = importtime_log.split(_marker, 1)[-1]
+    for line in log.splitlines():
+        if not line.startswith('import time:'): continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit(): continue
+        # Names are indented two spaces per nesting level after a single separator space
+        if len(name) - len(name.lstrip()) != 3: continue
+        entries.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(entries, key = lambda e: -e[1])[:n]
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Measure import time of geoEpic modules")
+    parser.add_argument("-m", "--modules", nargs='+', default = default_modules, help="Modules to import")
+    parser.add_argument("-r", "--repeat", type=int, default = 3, help="Number of runs per module")
+    parser.add_argument("-b", "--budget", type=float, default = None, help="Fail if any import takes longer (seconds)")
+    parser.add_argument("-d", "--detail", action="store_true", help="Show the slowest top-level imports")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    for module in args.modules:
+        seconds, slowest = measure_import(module, args.repeat)
+        if seconds is None:
+            print(f'{module:<22} failed: {slowest}')
+            continue
+        print(f'{module:<22} {seconds * 1000:9.1f} ms')
+        if args.detail:
+            for name, t in slowest:
+                print(f'    {name:<30} {t * 1000:9.1f} ms')
+        if args.budget is not None and seconds > args.budget:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Over the {args.budget} s budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -6,20 +6,68 @@ import importlib.util
 import shutil
 
 
-def read_gdb_layer(gdb_data, layer_name, columns = None, names = None):
+def read_gdb_layer(gdb_data, layer_name, columns = None, names = None, cache = False):
     """
     Reads selected columns from a GDB layer and returns them in a pandas DataFrame.
+
+    Columns are read in bulk with pyogrio, skipping geometries. With 'cache', the result is
+    also saved as Parquet next to the GDB ('<gdb name>_<layer_name>.parquet') and read from
+    there while it is newer than the GDB.
     
     Args:
-        gdb (gdb): The GDB file opened by ogr.
+        gdb_data (str or gdb): Path to the GDB, or the GDB file opened by ogr.
         layer_name (str): The name of the layer to read.
         columns (list, optional): List of column indices to read. If None, all columns are read.
         names (list, optional): List of column names corresponding to the indices in `columns`.
             If None, all column names are inferred from the layer definition.
+        cache (bool): Whether to use a Parquet cache of the layer (requires pyarrow).
     
     Returns:
         pd.DataFrame: The resulting dataframe.
     """
+    gdb_path = gdb_data if isinstance(gdb_data, str) else gdb_data.GetName()
+    cache_path = None
+    if cache and importlib.util.find_spec('pyarrow') is not None:
+        cache_path = f"{os.path.splitext(os.path.normpath(gdb_path))[0]}_{layer_name}.parquet"
+
+    if cache_path and names and os.path.exists(cache_path) and \
+            os.path.getmtime(cache_path) >= os.path.getmtime(gdb_path):
+        cached = pd.read_parquet(cache_path)
+        if set(names).issubset(cached.columns):
+            return cached[names]
+
+    if importlib.util.find_spec('pyogrio') is not None:
+        df = _read_gdb_layer_bulk(gdb_path, layer_name, columns, names)
+    else:
+        if isinstance(gdb_data, str):
+            from osgeo import ogr
+            gdb_data = ogr.GetDriverByName("OpenFileGDB").Open(gdb_data)
+        df = _read_gdb_layer_features(gdb_data, layer_name, columns, names)
+
+    if cache_path:
+        df.to_parquet(cache_path, index = False)
+    return df
+
+
+def _read_gdb_layer_bulk(gdb_path, layer_name, columns = None, names = None):
+    """Reads columns of a GDB layer with pyogrio, one array per column."""
+    import pyogrio
+    fields = list(pyogrio.read_info(gdb_path, layer = layer_name)['fields'])
+    if not columns:
+        columns = list(range(len(fields)))
+    if not names:
+        names = [fields[i] for i in columns]
+    selected = [fields[i] for i in columns]
+
+    df = pyogrio.read_dataframe(gdb_path, layer = layer_name, columns = selected, read_geometry = False,
+                                use_arrow = importlib.util.find_spec('pyarrow') is not None)
+    df = pd.DataFrame(df)[selected]
+    df.columns = names
+    return df
+
+
+def _read_gdb_layer_features(gdb_data, layer_name, columns = None, names = None):
+    """Reads columns of a GDB layer opened by ogr, one feature at a time."""
     layer = gdb_data.GetLayerByName(layer_name)
     layer_defn = layer.GetLayerDefn()
 
@@ -77,6 +125,11 @@ def filter_dataframe(df, expression):
                     frac = float(expression[7:-1])
                     df_copy = df_copy.sample(frac=frac)
 
+                # Handle expressions that are stratified samples (e.g., "Stratified(0.1)", "Stratified(0.1, soil, opc)")
+                elif expression.startswith("Stratified(") and expression.endswith(")"):
+                    values = [i.strip() for i in expression[11:-1].split(',')]
+                    df_copy = stratified_sample(df_copy, float(values[0]), values[1:] or None)
+
                 # Handle boolean expressions (e.g., "group == 1")
                 else:
                     df_copy = df_copy.query(expression)
@@ -91,7 +144,36 @@ def filter_dataframe(df, expression):
 
             
     return df.reset_index()
-    
+
+
+def stratified_sample(df, frac, columns = None, seed = 0):
+    """
+    Sample a fraction of rows covering as many strata as possible.
+
+    Rows are shuffled with a fixed seed and taken in rounds, one row per stratum per round,
+    so every stratum is represented before any is repeated. With the same seed a larger
+    fraction always returns a superset of a smaller one.
+
+    Args:
+        df (pd.DataFrame): The dataframe to sample.
+        frac (float): Fraction of rows to keep.
+        columns (list, optional): Columns defining the strata. Defaults to the
+            available of 'soil', 'dly' (weather cell) and 'opc' (crop management).
+        seed (int): Seed for shuffling the rows.
+
+    Returns:
+        pd.DataFrame: The sampled rows in their original order.
+    """
+    if columns is None:
+        columns = [col for col in ['soil', 'dly', 'opc'] if col in df.columns]
+    n = int(np.ceil(frac * len(df)))
+    if not columns or n >= len(df):
+        return df.sample(n=min(n, len(df)), random_state=seed).sort_index()
+    shuffled = df.sample(frac=1, random_state=seed)
+    rounds = shuffled.groupby(columns, sort=False, dropna=False).cumcount()
+    order = np.argsort(rounds.values, kind='stable')
+    return shuffled.iloc[order[:n]].sort_index()
+
 
 
 def import_function(cmd = None):
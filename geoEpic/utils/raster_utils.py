@@ -5,9 +5,7 @@ import rasterio
 from osgeo import gdal, osr
 from pyproj import Transformer
 from sklearn.neighbors import BallTree
-from rasterio.mask import mask
-from collections import Counter
-from shapely.geometry import mapping
+from rasterio.windows import Window
 from geoEpic.utils import parallel_executor
 from tqdm import tqdm
 
@@ -50,67 +48,173 @@ def raster_to_dataframe(raster_file):
 
     return pd.DataFrame(data_dict)
 
-def sample_raster_aggregated(raster_file, geometries, crs="EPSG:4326", agg_type="mean"):
+def sample_raster_aggregated(raster_file, geometries, crs="EPSG:4326", agg_type="mean",
+                             block_size=1024, max_workers=8):
     """
     Sample a raster file based on geometries (polygons) and return aggregated pixel values.
+
+    Geometries are reprojected once and grouped by the raster blocks they cover. Each block is
+    read and rasterised once for all its polygons (pixels with their center inside a polygon,
+    as with rasterio.mask), and blocks are processed in parallel. Nodata pixels are ignored.
     
     Args:
         raster_file (str): Path to the raster file.
-        geometries (list): List of geometries (polygons) in GeoJSON-like format or Shapely geometries.
-        crs (str): The CRS of the geometries.
+        geometries (list or GeoSeries): Geometries (polygons) as Shapely geometries, a GeoSeries or a GeoDataFrame.
+        crs (str): The CRS of the geometries, if they do not carry one.
         agg_type (str): Type of aggregation ('mean', 'median', or 'mode').
+        block_size (int): Size in pixels of the square blocks processed by each task.
+        max_workers (int): Number of processes working on blocks.
         
     Returns:
-        pd.DataFrame: A dataframe with geometry indices and aggregated pixel values.
+        pd.DataFrame: A dataframe with one row of aggregated pixel values per geometry, NaN for
+            geometries covering no pixel.
     """
-    agg_funcs = {
-        'mean': np.mean,
-        'median': np.median,
-        'mode': lambda x: Counter(x).most_common(1)[0][0]  # custom function to get the mode
-    }
+    from rasterio.windows import from_bounds
 
-    if agg_type not in agg_funcs:
+    if agg_type not in ('mean', 'median', 'mode'):
         raise ValueError(f"Invalid aggregation type: {agg_type}. Choose 'mean', 'median', or 'mode'.")
 
-    # Ensure the geometries are in the raster's CRS
+    if isinstance(geometries, gpd.GeoDataFrame):
+        geometries = geometries.geometry
+    if not isinstance(geometries, gpd.GeoSeries):
+        geometries = gpd.GeoSeries(list(geometries), crs=crs)
+    elif geometries.crs is None:
+        geometries = geometries.set_crs(crs)
+
     with rasterio.open(raster_file) as src:
-        if crs != src.crs:
-            geometries = [g.to_crs(src.crs) for g in geometries]
-        
-        band_names = src.descriptions or [f"band_{i}" for i in range(1, src.count + 1)]
-        
-        # Collect the results
-        results = []
-            
-        for i, geom in enumerate(tqdm(geometries, desc="Processing Geometries")):
-            geom = [mapping(geom)]  # Convert the geometry to GeoJSON format for rasterio masking
-            try:
-                out_image, out_transform = mask(src, geom, crop=True, filled=False)
+        # Ensure the geometries are in the raster's CRS
+        if geometries.crs != src.crs:
+            geometries = geometries.to_crs(src.crs)
+        height, width, trans = src.height, src.width, src.transform
+        band_names = [name if name else f'band_{i}' for i, name in enumerate(src.descriptions, 1)]
+        count = src.count
+
+    geoms = geometries.values
+    layers = _overlap_layers(geoms)
+
+    # Group polygons by the blocks their bounds cover
+    blocks = {}
+    for i, bounds in enumerate(geometries.bounds.values):
+        if np.isnan(bounds).any(): continue
+        window = from_bounds(*bounds, transform=trans)
+        row0, col0 = max(int(np.floor(window.row_off)), 0), max(int(np.floor(window.col_off)), 0)
+        row1 = min(int(np.ceil(window.row_off + window.height)), height) - 1
+        col1 = min(int(np.ceil(window.col_off + window.width)), width) - 1
+        for br in range(row0 // block_size, row1 // block_size + 1):
+            for bc in range(col0 // block_size, col1 // block_size + 1):
+                blocks.setdefault((br, bc), []).append(i)
+
+    tasks = []
+    for (br, bc), inds in blocks.items():
+        row_off, col_off = br * block_size, bc * block_size
+        window = (col_off, row_off, min(block_size, width - col_off), min(block_size, height - row_off))
+        shapes = {}
+        for i in inds:
+            shapes.setdefault(layers[i], []).append((geoms[i], i + 1))
+        tasks.append((raster_file, window, list(shapes.values()), agg_type))
+
+    if max_workers > 1 and len(tasks) > 1:
+        partials, _ = parallel_executor(_zonal_block, tasks, max_workers=max_workers, return_value=True)
+    else:
+        partials = [_zonal_block(task) for task in tqdm(tasks, desc="Processing Blocks")]
+    partials = [p for p in partials if p is not None]
+
+    n = len(geoms)
+    result = np.full((count, n), np.nan)
+    for j in range(count):
+        labels = np.concatenate([p[0][j] for p in partials] + [np.empty(0, dtype=np.int64)])
+        if agg_type == 'mean':
+            sums = np.bincount(labels, weights=np.concatenate([p[1][j] for p in partials] + [np.empty(0)]), minlength=n + 1)
+            counts = np.bincount(labels, weights=np.concatenate([p[2][j] for p in partials] + [np.empty(0)]), minlength=n + 1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[j] = (sums / counts)[1:]
+            continue
+
+        values = np.concatenate([p[1][j] for p in partials] + [np.empty(0)]).astype(np.float64)
+        order = np.lexsort((values, labels))
+        labels, values = labels[order], values[order]
+        if agg_type == 'median':
+            ids, starts, counts = np.unique(labels, return_index=True, return_counts=True)
+            result[j, ids - 1] = (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2
+        else:
+            # Runs of equal (label, value); the longest run of each label is its mode, the smallest value on ties
+            run_starts = np.flatnonzero(np.r_[True, (labels[1:] != labels[:-1]) | (values[1:] != values[:-1])])
+            run_lengths = np.diff(np.r_[run_starts, len(labels)])
+            run_labels = labels[run_starts]
+            best = np.lexsort((-run_lengths, run_labels))
+            first = np.r_[True, run_labels[best][1:] != run_labels[best][:-1]]
+            result[j, run_labels[best][first] - 1] = values[run_starts[best][first]]
 
-                # Flatten the raster values and filter out nodata values
-                # out_image is a masked array; use `out_image.data` to get valid values
-                flattened_values = out_image.data[~out_image.mask].flatten()
+    return pd.DataFrame(result.T, columns=band_names)
 
-                if flattened_values.size > 0:
-                    # Apply the chosen aggregation function
-                    agg_values = {band_names[j]: agg_funcs[agg_type](flattened_values[j::src.count])
-                                  for j in range(src.count)}
-                else:
-                    # No valid values within the geometry
-                    agg_values = {band_name: np.nan for band_name in band_names}
 
-                results.append(agg_values)
+def _overlap_layers(geoms):
+    """
+    Assign geometries to layers such that no two geometries of a layer share interior area,
+    so each layer can be rasterised in one pass. Non-overlapping polygons all go to layer 0.
+    """
+    from shapely import STRtree
+    tree = STRtree(geoms)
+    pairs = tree.query(geoms, predicate='intersects')
+    touching = tree.query(geoms, predicate='touches')
+    n = len(geoms)
+    keys = np.setdiff1d(pairs[0] * n + pairs[1], touching[0] * n + touching[1])
+    a, b = np.divmod(keys, n)
+    a, b = a[a < b], b[a < b]
+
+    layers = np.zeros(n, dtype=np.int64)
+    neighbours = {}
+    for i, k in zip(a, b):
+        neighbours.setdefault(i, []).append(k)
+        neighbours.setdefault(k, []).append(i)
+    for i in sorted(neighbours):
+        taken = {layers[k] for k in neighbours[i] if k < i}
+        layers[i] = next(layer for layer in range(len(taken) + 1) if layer not in taken)
+    return layers
+
+
+def _zonal_block(task):
+    """
+    Rasterise the polygons of one block and reduce the pixels under them.
 
-            except Exception as e:
-                print(f"Error processing geometry {i}: {e}")
-                continue
+    Returns:
+        tuple: For 'mean', per band (labels, sums, counts); otherwise per band (labels, values) of every
+            valid pixel under a polygon, with labels being the geometry index plus one.
+    """
+    from rasterio.features import rasterize
+    raster_file, (col_off, row_off, w, h), layers, agg_type = task
+    with rasterio.open(raster_file) as src:
+        window = Window(col_off, row_off, w, h)
+        data = src.read(window=window, masked=True)
+        block_trans = src.window_transform(window)
 
-    return pd.DataFrame(results)
+    label_layers = [rasterize(shapes, out_shape=(h, w), transform=block_trans, fill=0, dtype='int32')
+                    for shapes in layers]
+    out = ([], [], []) if agg_type == 'mean' else ([], [])
+    masks = np.ma.getmaskarray(data)
+    if data.dtype.kind == 'f': masks |= np.isnan(data.data)
+    for band, mask in zip(data.data, masks):
+        labels, values = [], []
+        for label in label_layers:
+            keep = (label > 0) & ~mask
+            labels.append(label[keep].astype(np.int64))
+            values.append(band[keep])
+        labels, values = np.concatenate(labels), np.concatenate(values)
+        if agg_type == 'mean':
+            ids, inverse = np.unique(labels, return_inverse=True)
+            out[0].append(ids)
+            out[1].append(np.bincount(inverse, weights=values.astype(np.float64), minlength=len(ids)))
+            out[2].append(np.bincount(inverse, minlength=len(ids)).astype(np.float64))
+        else:
+            out[0].append(labels)
+            out[1].append(values)
+    return out
 
 
 def sample_raster_nearest(raster_file, coords, crs="EPSG:4326"):
     """
     Sample a raster file at specific coordinates, taking the nearest pixel.
+    Only the blocks of the raster containing coordinates are read.
     
     Args:
         raster_file (str): Path to the raster file.
@@ -118,32 +222,153 @@ def sample_raster_nearest(raster_file, coords, crs="EPSG:4326"):
         crs (str): The CRS the coords are in.
         
     Returns:
-        dict: A dictionary with band names as keys and lists of pixel values at the given coordinates as values.
+        pd.DataFrame: Coordinates in the raster's CRS and the pixel values of each band at them.
     """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
     with rasterio.open(raster_file) as src:
-        bands = src.read()
         band_names = src.descriptions
 
         # Convert coordinates to raster's CRS
         transformer = Transformer.from_crs(crs, src.crs, always_xy=True)
-        transformed_coords = np.array([transformer.transform(*coord) for coord in coords])
+        xs, ys = transformer.transform(coords[:, 0], coords[:, 1])
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
 
-        # Get the values of the nearest pixels
-        rows, cols = src.index(*transformed_coords.T)
-        
-        # Clip rows and cols to be within bounds
+        # Get the nearest pixels, clipped to be within bounds
+        rows, cols = _pixel_index(src.transform, xs, ys)
         rows = np.clip(rows, 0, src.height - 1)
         cols = np.clip(cols, 0, src.width - 1)
 
-        samples = {"lon": transformed_coords[:, 0], "lat": transformed_coords[:, 1]}
-        
-        for i, band in enumerate(bands, 1):
-            band_name = band_names[i-1] if band_names[i-1] else f'band_{i}'
-            samples[band_name] = band[rows, cols]
-        
+        values = _read_pixels(src, rows, cols)
+
+    samples = {"lon": xs, "lat": ys}
+    for i, band in enumerate(values, 1):
+        band_name = band_names[i-1] if band_names[i-1] else f'band_{i}'
+        samples[band_name] = band
     return pd.DataFrame(samples)
 
 
+def _pixel_index(trans, xs, ys):
+    """
+    Returns row and column indices of the pixels containing coordinates 'xs', 'ys'.
+    """
+    cols, rows = ~trans * (xs, ys)
+    return np.floor(rows).astype(np.int64), np.floor(cols).astype(np.int64)
+
+
+def _read_pixels(src, rows, cols, window_size = 256):
+    """
+    Read pixel values of all bands at 'rows', 'cols', one window at a time.
+
+    Pixels are grouped by the window containing them, so only windows with at least one
+    pixel are read. Windows follow the raster's internal blocks, at least 'window_size'
+    rows high (for striped rasters) and at most 8 * 'window_size' columns wide.
+
+    Returns:
+        np.ndarray: Array of shape (bands, pixels).
+    """
+    block_h, block_w = src.block_shapes[0]
+    win_h = min(max(block_h, window_size), src.height)
+    win_w = min(max(block_w, window_size), 8 * window_size, src.width)
+
+    out = np.empty((src.count, len(rows)), dtype=np.result_type(*src.dtypes))
+    if len(rows) == 0: return out
+
+    win_rows, win_cols = rows // win_h, cols // win_w
+    window_ids = win_rows * (src.width // win_w + 1) + win_cols
+    order = np.argsort(window_ids, kind='stable')
+    starts = np.flatnonzero(np.diff(window_ids[order], prepend=-1))
+    for idx in np.split(order, starts[1:]):
+        row_off, col_off = win_rows[idx[0]] * win_h, win_cols[idx[0]] * win_w
+        window = Window(col_off, row_off, min(win_w, src.width - col_off), min(win_h, src.height - row_off))
+        data = src.read(window=window)
+        out[:, idx] = data[:, rows[idx] - row_off, cols[idx] - col_off]
+    return out
+
+
+def sample_raster_valid(raster_file, coords, is_valid = None, crs = None, band = 1, max_radius = 256):
+    """
+    Sample one band of a raster at specific coordinates, taking the nearest valid pixel.
+
+    The pixel containing each coordinate is read block by block; where it is nodata, NaN,
+    rejected by 'is_valid' or outside the raster, the nearest valid pixel is searched in
+    windows around it. Memory scales with the number of coordinates, not the raster size.
+
+    Args:
+        raster_file (str): Path to the raster file.
+        coords (array-like): Array of (x, y)/(lon, lat) coordinates.
+        is_valid (callable, optional): Takes an array of pixel values and returns a boolean array.
+        crs (str, optional): The CRS the coords are in. Defaults to the raster's CRS.
+        band (int): Band to sample.
+        max_radius (int): Largest search radius in pixels. Points without a valid pixel
+            within it get the raster's nodata value (or 0).
+
+    Returns:
+        np.ndarray: Pixel values at the given coordinates.
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    with rasterio.open(raster_file) as src:
+        xs, ys = coords[:, 0], coords[:, 1]
+        if crs is not None:
+            transformer = Transformer.from_crs(crs, src.crs, always_xy=True)
+            xs, ys = map(np.asarray, transformer.transform(xs, ys))
+        cols, rows = ~src.transform * (xs, ys)
+        nodata = src.nodata
+
+        def valid(values):
+            ok = np.ones(values.shape, dtype=bool)
+            if values.dtype.kind == 'f': ok &= ~np.isnan(values)
+            if nodata is not None: ok &= values != nodata
+            if is_valid is not None: ok &= is_valid(values)
+            return ok
+
+        inside = (rows >= 0) & (rows < src.height) & (cols >= 0) & (cols < src.width)
+        values = np.full(len(coords), nodata if nodata is not None else 0, dtype=src.dtypes[band - 1])
+        hits = np.flatnonzero(inside)
+        values[hits] = _read_pixels(src, np.floor(rows[hits]).astype(np.int64),
+                                    np.floor(cols[hits]).astype(np.int64))[band - 1]
+
+        missing = np.flatnonzero(~(inside & valid(values)))
+        aspect = abs(src.transform.a / src.transform.e)
+        read = lambda row_off, col_off, h, w: src.read(band, window=Window(col_off, row_off, w, h))
+        for i in missing:
+            found = _nearest_valid(read, valid, src.height, src.width, rows[i], cols[i], aspect, max_radius)
+            if found is not None: values[i] = found
+        if len(missing):
+            unresolved = len(missing) - int(valid(values[missing]).sum())
+            if unresolved:
+                print(f"No valid pixel within {max_radius} pixels of {unresolved} coordinates")
+    return values
+
+
+def _nearest_valid(read, valid, height, width, row, col, aspect, max_radius):
+    """
+    Returns the value of the nearest valid pixel to fractional pixel position 'row', 'col',
+    searching windows of growing radius, or None if there is none within 'max_radius'.
+    """
+    r0 = int(np.clip(np.floor(row), 0, height - 1))
+    c0 = int(np.clip(np.floor(col), 0, width - 1))
+    # Pixels outside a window of radius r are at least r * unit away
+    unit = min(1.0, aspect)
+    # Reads decode whole blocks, so small windows cost about the same as tiny ones
+    radius = min(8, max_radius)
+    while True:
+        top, left = max(r0 - radius, 0), max(c0 - radius, 0)
+        h, w = min(r0 + radius + 1, height) - top, min(c0 + radius + 1, width) - left
+        data = read(top, left, h, w)
+        vr, vc = np.nonzero(valid(data))
+        if len(vr):
+            dist = np.hypot(vr + top + 0.5 - row, (vc + left + 0.5 - col) * aspect)
+            j = np.argmin(dist)
+            needed = int(np.ceil(dist[j] / unit))
+            if needed <= radius or radius >= max_radius:
+                return data[vr[j], vc[j]]
+            radius = min(needed, max_radius)
+        elif radius >= max_radius:
+            return None
+        else:
+            radius = min(radius * 2, max_radius)
+
+
 def reproject_crop_raster(src, dst, out_epsg, min_coords, max_coords):
     """
     Reproject and crop a raster file.
@@ -164,11 +389,19 @@ def reproject_crop_raster(src, dst, out_epsg, min_coords, max_coords):
 
 class GeoInterface:
     def __init__(self, data_source):
-        """Initialize the interface by loading the data source."""
+        """
+        Initialize the interface by loading the data source.
+
+        Rasters on a regular (north-up) grid are kept as arrays and queried by inverse affine
+        indexing; other sources are indexed with a haversine BallTree over their points.
+        """
+        self.grid = None
         if isinstance(data_source, str):
             if data_source.lower().endswith(('.tif', '.tiff')):
                 # Handle raster file
-                self.df = raster_to_dataframe(data_source).dropna()
+                self.grid = _RegularGrid.open(data_source)
+                if self.grid is None:
+                    self.df = raster_to_dataframe(data_source).dropna()
             elif data_source.lower().endswith('.csv'):
                 # Handle CSV file
                 self.df = pd.read_csv(data_source).dropna()
@@ -192,9 +425,24 @@ class GeoInterface:
             raise ValueError("data_source must be a file path (CSV, TIF, or shapefile) or a pandas DataFrame.")
         
         # Prepare data for haversine distance queries
+        if self.grid is None:
+            self._build_tree()
+
+    def _build_tree(self):
+        """Builds the BallTree over the points of 'df'."""
         self.points_rad = np.deg2rad(self.df[['lat', 'lon']].values)
         self.tree = BallTree(self.points_rad, metric='haversine')
 
+    def __getattr__(self, name):
+        # Gridded sources only build the per-pixel table and tree when they are asked for
+        if name in ('df', 'points_rad', 'tree') and self.__dict__.get('grid') is not None:
+            if name == 'df':
+                self.df = self.grid.to_dataframe()
+            else:
+                self._build_tree()
+            return self.__dict__[name]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
     def lookup(self, lat, lon):
         """
         Find the nearest data point to a single latitude and longitude.
@@ -206,6 +454,8 @@ class GeoInterface:
         Returns:
             pandas.Series: The row from the DataFrame corresponding to the nearest point.
         """
+        if self.grid is not None:
+            return self.grid.rows(self.grid.nearest([lat], [lon])).iloc[0]
         query_point_rad = np.deg2rad(np.array([[lat, lon]]))
         _, index = self.tree.query(query_point_rad, k=1)
         nearest_index = index[0][0]
@@ -225,6 +475,9 @@ class GeoInterface:
         """
         if len(lats) != len(lons):
             raise ValueError("Latitude and longitude lists must have the same length.")
+
+        if self.grid is not None and k == 1:
+            return self.grid.rows(self.grid.nearest(lats, lons))
             
         lat_lon_pairs = np.vstack((lats, lons)).T
         query_points_rad = np.deg2rad(lat_lon_pairs)
@@ -234,7 +487,118 @@ class GeoInterface:
             return self.df.iloc[indices.flatten()]
         else:
             return [self.df.iloc[index] for index in indices]
-    
+
+    def lookup_many(self, lats, lons, column = None):
+        """
+        Find the value of 'column' at the nearest data point to each latitude and longitude.
+
+        Args:
+            lats (array-like): Latitudes of the query points.
+            lons (array-like): Longitudes of the query points.
+            column (str, optional): Column (or band name) to return. Defaults to the first
+                band of a raster or the first column other than 'lat' and 'lon'.
+
+        Returns:
+            np.ndarray: Values of 'column' at the nearest point, in the order of the queries.
+        """
+        lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+        if lats.shape != lons.shape:
+            raise ValueError("Latitude and longitude lists must have the same length.")
+
+        if self.grid is not None:
+            band = self.grid.band_names.index(column) if column is not None else 0
+            return self.grid.bands[band].ravel()[self.grid.nearest(lats, lons)]
+
+        if column is None:
+            column = next(col for col in self.df.columns if col not in ('lat', 'lon'))
+        query_points_rad = np.deg2rad(np.column_stack((lats, lons)))
+        _, indices = self.tree.query(query_points_rad, k=1)
+        return self.df[column].values[indices[:, 0]]
+
+
+class _RegularGrid:
+    """
+    Bands of a north-up raster with nearest-pixel lookup by inverse affine transform.
+
+    Pixels with NaN in any band are treated as missing, like the rows dropped from
+    'raster_to_dataframe'. Points on a missing pixel or outside the raster are assigned
+    the nearest valid pixel.
+    """
+    def __init__(self, bands, trans, band_names, crs = None):
+        self.bands = bands
+        self.trans = trans
+        self.height, self.width = bands.shape[1:]
+        self.band_names = [name if name else f'band_{i}' for i, name in enumerate(band_names, 1)]
+        self.valid = ~np.isnan(bands).any(axis=0) if bands.dtype.kind == 'f' else None
+        self.geographic = crs is None or crs.is_geographic
+        self.transformer = None if self.geographic else Transformer.from_crs("EPSG:4326", crs, always_xy=True)
+        self.edge, self.tree = None, None
+
+    @classmethod
+    def open(cls, raster_file):
+        """Returns the grid of 'raster_file', or None if the raster is rotated or has no transform."""
+        with rasterio.open(raster_file) as src:
+            trans = src.transform
+            if trans.b != 0 or trans.d != 0 or trans == rasterio.Affine.identity():
+                return None
+            return cls(src.read(), trans, src.descriptions, src.crs)
+
+    def nearest(self, lats, lons):
+        """
+        Returns flat indices (row * width + col) of the nearest valid pixel to each point.
+        """
+        lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+        xs, ys = (lons, lats) if self.transformer is None else self.transformer.transform(lons, lats)
+        cols, rows = ~self.trans * (np.asarray(xs, dtype=float), np.asarray(ys, dtype=float))
+        inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+        r = np.clip(np.floor(rows), 0, self.height - 1).astype(np.int64)
+        c = np.clip(np.floor(cols), 0, self.width - 1).astype(np.int64)
+        found = inside if self.valid is None else inside & self.valid[r, c]
+
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            # The nearest valid pixel to a point off the valid area always lies on its edge
+            tree = self._edge_tree()
+            points = np.deg2rad(np.column_stack((lats[missing], lons[missing]))) if self.geographic \
+                else np.column_stack((xs[missing], ys[missing]))
+            _, index = tree.query(points, k=1)
+            r[missing], c[missing] = np.divmod(self.edge[index[:, 0]], self.width)
+        return r * self.width + c
+
+    def _edge_tree(self):
+        """Builds (once) a BallTree over the centers of valid pixels next to a missing pixel or the raster border."""
+        if self.tree is None:
+            valid = self.valid if self.valid is not None else np.ones((self.height, self.width), dtype=bool)
+            padded = np.pad(valid, 1, constant_values=False)
+            interior = valid.copy()
+            for dr in range(3):
+                for dc in range(3):
+                    interior &= padded[dr:dr + self.height, dc:dc + self.width]
+            self.edge = np.flatnonzero(valid & ~interior)
+            r, c = np.divmod(self.edge, self.width)
+            xs, ys = self.trans * (c + 0.5, r + 0.5)
+            if self.geographic:
+                self.tree = BallTree(np.deg2rad(np.column_stack((ys, xs))), metric='haversine')
+            else:
+                self.tree = BallTree(np.column_stack((xs, ys)))
+        return self.tree
+
+    def rows(self, flat):
+        """Returns a DataFrame with pixel-center 'lon', 'lat' and band values, indexed by flat pixel index."""
+        r, c = np.divmod(np.asarray(flat), self.width)
+        lon, lat = self.trans * (c + 0.5, r + 0.5)
+        data = {'lon': lon, 'lat': lat}
+        for name, band in zip(self.band_names, self.bands):
+            data[name] = band[r, c]
+        return pd.DataFrame(data, index=flat)
+
+    def to_dataframe(self):
+        """Returns all valid pixels, as 'raster_to_dataframe(...).dropna()' would."""
+        flat = np.arange(self.height * self.width)
+        if self.valid is not None: flat = flat[self.valid.ravel()]
+        return self.rows(flat)
+
+
 def _lon_lat_coords(trans, shape):
     """
     Computes longitude, latitude coordinates for pixel centers.
@@ -1,4 +1,5 @@
 import os
+import argparse
 from multiprocessing.managers import BaseManager
 import queue
 
@@ -16,9 +17,18 @@ def get_pool_queue(name):
 def is_new_queue(name):
     return name not in shared_queues
 
-manager = QueueManager(address=('', 50001), authkey=b'abc123')
-manager.register('get_pool_queue', get_pool_queue)
-manager.register('is_new_queue', is_new_queue)
-server = manager.get_server()
-print(f"Server started at PID {os.getpid()}...")
-server.serve_forever()
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Queue server shared by ManagerWorkerPool instances")
+    parser.add_argument("-p", "--port", type=int, default=50001, help="Port to listen on")
+    parser.add_argument("-k", "--authkey", default="abc123", help="Password of the server")
+    args = parser.parse_args(argv)
+
+    manager = QueueManager(address=('', args.port), authkey=args.authkey.encode())
+    manager.register('get_pool_queue', get_pool_queue)
+    manager.register('is_new_queue', is_new_queue)
+    server = manager.get_server()
+    print(f"Server started at PID {os.getpid()} on port {args.port}...")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
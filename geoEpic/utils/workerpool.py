@@ -2,10 +2,16 @@ import os
 import shutil
 import shortuuid
 import time
+import tempfile
 from multiprocessing.managers import BaseManager
 import queue
 import subprocess
 import sys
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 
 class QueueManager(BaseManager):
@@ -17,41 +23,192 @@ class TimeoutException(Exception):
     pass
 
 
+def _lock(fd):
+    """ Lock an open file without blocking, raising BlockingIOError if another process holds it. """
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return
+    try:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        raise BlockingIOError(f"File descriptor {fd} is locked")
+
+def _unlock(fd):
+    """ Release a lock taken with _lock. """
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
 class WorkerPool:
+    """ A pool of resources shared by all processes on this machine.
+
+        Each resource is a slot guarded by an exclusive lock on its own lock file,
+        so acquiring and releasing are local system calls and need no server.
+        Pools are found by key, and slots held by a process that dies are freed by the OS.
+        Use ManagerWorkerPool to share a pool between machines. """
+
+    def __init__(self, pool_key: str = None, base_dir: str = None, lock_dir: str = None):
+        """ Initialize the worker pool with optional specific pool key and base directory.
+            Lock files are kept in 'lock_dir', the system temporary directory by default. """
+        self.pool_key = pool_key or f"worker_pool_{shortuuid.uuid()}"
+        self.base_dir = base_dir
+        self.lock_dir = os.path.join(lock_dir or tempfile.gettempdir(), 'geo_epic_pools', self.pool_key)
+        self._held = {}
+        self._size = None
+
+        if self.base_dir:
+            os.makedirs(self.base_dir, exist_ok=True)
+
+    @property
+    def opened(self):
+        return self.size is not None
+
+    @property
+    def size(self):
+        """ Number of resources in the pool, or None if it has not been opened. """
+        if self._size is None:
+            try:
+                with open(os.path.join(self.lock_dir, 'size')) as f:
+                    self._size = int(f.read())
+            except (FileNotFoundError, ValueError):
+                return None
+        return self._size
+
+    def open(self, max_resources: int):
+        """ Open and allocate a specified number of resources. """
+        os.makedirs(self.lock_dir, exist_ok=True)
+        for i in range(max_resources):
+            open(os.path.join(self.lock_dir, f'{i}.lock'), 'a').close()
+            if self.base_dir:
+                os.makedirs(self._resource(i), exist_ok=True)
+        # Publish the size last, so other processes only see a complete pool
+        tmp = os.path.join(self.lock_dir, f'size.{os.getpid()}')
+        with open(tmp, 'w') as f:
+            f.write(str(max_resources))
+        os.replace(tmp, os.path.join(self.lock_dir, 'size'))
+        self._size = max_resources
+
+    def acquire(self, timeout=120):
+        """ Acquire a resource from the pool. """
+        size = self.size
+        if size is None:
+            raise RuntimeError(f"Pool '{self.pool_key}' has not been opened")
+        deadline = time.time() + timeout
+        wait = 0.001
+        start = (os.getpid() + len(self._held)) % size
+        while True:
+            for k in range(size):
+                i = (start + k) % size
+                fd = self._try_lock(i)
+                if fd is not None:
+                    resource = self._resource(i)
+                    self._held[resource] = fd
+                    return resource
+            if time.time() > deadline:
+                raise TimeoutException(f"Timed out waiting for a resource after {timeout} seconds")
+            time.sleep(wait)
+            wait = min(wait * 2, 0.05)
+
+    def release(self, resource: str):
+        """ Release a resource back to the pool. """
+        fd = self._held.pop(resource)
+        _unlock(fd)
+        os.close(fd)
+
+    def close(self):
+        """ Clean up resources and empty the pool. """
+        size = self.size
+        if size is None: return
+        for i in range(size):
+            fd = self._try_lock(i)
+            if fd is None: continue
+            if self.base_dir and os.path.exists(self._resource(i)):
+                shutil.rmtree(self._resource(i), ignore_errors=True)
+            os.close(fd)
+        shutil.rmtree(self.lock_dir, ignore_errors=True)
+        self._size = None
+
+    def queue_len(self) -> int:
+        """ Return the current number of available resources in the pool. """
+        size = self.size
+        if size is None: return None
+        free = 0
+        for i in range(size):
+            fd = self._try_lock(i)
+            if fd is not None:
+                free += 1
+                _unlock(fd)
+                os.close(fd)
+        return free
+
+    def _resource(self, i):
+        return os.path.join(self.base_dir, str(i)) if self.base_dir else str(i)
+
+    def _try_lock(self, i):
+        """ Lock slot 'i' without blocking, returning the file descriptor or None if it is taken. """
+        try:
+            fd = os.open(os.path.join(self.lock_dir, f'{i}.lock'), os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        try:
+            _lock(fd)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_held'] = {}
+        return state
+
+
+class ManagerWorkerPool:
     """ A pool for managing workers and resources, leveraging multiprocessing
-        to handle resource allocation through queues. """
-    server_process = None
+        to handle resource allocation through queues.
+        A queue server shares the pool between machines; use WorkerPool on a single node. """
+    # Queue servers started by this process, by port
+    server_processes = {}
 
     @classmethod
-    def start_server(cls):
-        """ Start the queue server as a separate process if it's not already running. """
-        if cls.server_process is None:
+    def start_server(cls, port=50001, authkey=b'abc123'):
+        """ Start the queue server on 'port' as a separate process if it's not already running. """
+        if port not in cls.server_processes:
             # Get the current script's directory
             script_dir = os.path.dirname(os.path.abspath(__file__))
             server_script_path = os.path.join(script_dir, 'start_manager.py')
-            log_path = os.path.join(script_dir, 'server_log.txt')
+            log_path = os.path.join(script_dir, f'server_log_{port}.txt')
             # Start the server script as a subprocess
-            cls.log_file = open(log_path, 'w')
-            cls.server_process = subprocess.Popen([sys.executable, server_script_path],
-                                                  stdout=cls.log_file,
-                                                  stderr=cls.log_file,
-                                                  start_new_session=True)
-            print(f"Pool Manager Server starting. (Logging to {log_path})")
-            time.sleep(1)  # Give the server a moment to start
+            log_file = open(log_path, 'w')
+            cls.server_processes[port] = subprocess.Popen([sys.executable, server_script_path,
+                                                           '--port', str(port), '--authkey', authkey.decode()],
+                                                          stdout=log_file,
+                                                          stderr=log_file,
+                                                          start_new_session=True)
+            log_file.close()
+            print(f"Pool Manager Server starting on port {port}. (Logging to {log_path})")
 
     @classmethod
     def stop_server(cls):
-        """ Stop the queue server cleanly. """
-        if cls.server_process:
-            cls.server_process.terminate()
-            cls.server_process.join()
-            print("Server stopped.")
-            cls.server_process = None
-
-    def __init__(self, pool_key: str = None, base_dir: str = None):
-        """ Initialize the worker pool with optional specific pool key and base directory. """
+        """ Stop the queue servers cleanly. """
+        for port, process in list(cls.server_processes.items()):
+            process.terminate()
+            process.wait()
+            del cls.server_processes[port]
+            print(f"Server on port {port} stopped.")
+
+    def __init__(self, pool_key: str = None, base_dir: str = None, address=('localhost', 50001), authkey=b'abc123'):
+        """ Initialize the worker pool with optional specific pool key and base directory.
+            'address' is the (host, port) of the queue server, and 'authkey' its password;
+            the server is started only if local. """
         self.pool_key = pool_key or f"worker_pool_{shortuuid.uuid()}"
         self.base_dir = base_dir
+        self.address = tuple(address)
+        self.authkey = authkey
         self.opened = False
 
         self.ensure_server_running()
@@ -65,13 +222,20 @@ class WorkerPool:
         try:
             self.connect_to_server()
         except ConnectionRefusedError:
-            self.start_server()
+            if self.address[0] not in ('localhost', '127.0.0.1'): raise
+            self.start_server(self.address[1], self.authkey)
+            # Wait until the server accepts connections
+            for _ in range(100):
+                try:
+                    return self.connect_to_server()
+                except ConnectionRefusedError:
+                    time.sleep(0.05)
 
     def connect_to_server(self):
         """ Connect to the queue server using the BaseManager. """
         QueueManager.register('get_pool_queue')
         QueueManager.register('is_new_queue')
-        self.manager = QueueManager(address=('localhost', 50001), authkey=b'abc123')
+        self.manager = QueueManager(address=self.address, authkey=self.authkey)
         self.manager.connect()
         self.opened = not self.manager.is_new_queue(self.pool_key)
         self.queue = self.manager.get_pool_queue(self.pool_key)
@@ -109,7 +273,7 @@ class WorkerPool:
         else: return None
 
     def __del__(self):
-        """ Clean up resources when the WorkerPool instance is deleted. """
+        """ Clean up resources when the ManagerWorkerPool instance is deleted. """
         if hasattr(self, 'manager'):
             try:
                 self.manager._close()
@@ -120,8 +284,6 @@ if __name__ == "__main__":
     # Test the WorkerPool class
     # try:
     # Create a WorkerPool instance
-    WorkerPool.stop_server()
-
     pool = WorkerPool(pool_key="test_pool_2")
     print(f"Pool opened with {pool.queue_len()} resources")
     
@@ -156,5 +318,5 @@ if __name__ == "__main__":
         
     # finally:
     #     # Ensure the server is stopped
-    #     WorkerPool.stop_server()
+    #     ManagerWorkerPool.stop_server()
 
@@ -1,28 +1,32 @@
 import os
 import argparse
+from functools import partial
 from geoEpic.io import DLY
 from geoEpic.utils import parallel_executor
 from glob import glob
 
-parser = argparse.ArgumentParser(description="Daily to Monthly")
-parser.add_argument("-i", "--input", required = True, help="Path to the input file or folder")
-parser.add_argument("-o", "--output", default = "./Monthly", help = "Path to the output dir")
-parser.add_argument("-w", "--max_workers", default = 20, help = "No. of maximum workers")
-args = parser.parse_args()
-
-output_folder = args.output if args.output else "./Monthly"
-os.makedirs(output_folder, exist_ok = True)
-
-def convert_file(file_path):
-    dly = DLY(file_path)
+def convert_file(file_path, output_folder = "./Monthly"):
+    dly = DLY.load(file_path)
     file_name = os.path.splitext(os.path.basename(file_path))[0]
     dly.to_monthly(os.path.join(output_folder, file_name))
-        
-if os.path.isfile(args.input):
-    convert_file(args.input)
-elif os.path.isdir(args.input):
-    file_list = glob(args.input + '/*')
-    parallel_executor(convert_file, file_list, max_workers = args.max_workers)
-else:
-    print("Invalid input. Please provide a valid file or folder path.")
 
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Daily to Monthly")
+    parser.add_argument("-i", "--input", required = True, help="Path to the input file or folder")
+    parser.add_argument("-o", "--output", default = "./Monthly", help = "Path to the output dir")
+    parser.add_argument("-w", "--max_workers", default = 20, help = "No. of maximum workers")
+    args = parser.parse_args(argv)
+
+    output_folder = args.output if args.output else "./Monthly"
+    os.makedirs(output_folder, exist_ok = True)
+            
+    if os.path.isfile(args.input):
+        convert_file(args.input, output_folder)
+    elif os.path.isdir(args.input):
+        file_list = glob(args.input + '/*')
+        parallel_executor(partial(convert_file, output_folder = output_folder), file_list, max_workers = int(args.max_workers))
+    else:
+        print("Invalid input. Please provide a valid file or folder path.")
+
+if __name__ == '__main__':
+    main()
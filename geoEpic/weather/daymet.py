@@ -1,55 +1,205 @@
+import os
+import gzip
+import time
+import threading
 import numpy as np
 import pandas as pd
 import requests
 from io import StringIO
+from geoEpic.utils import parallel_executor
 from geoEpic.utils.formule import rh_vappr
 
-def get_daymet_data(lat: float, lon: float, start: str, end: str):
+DAYMET_URL = "https://daymet.ornl.gov/single-pixel/api/data"
+DAYMET_VARS = "dayl,prcp,srad,swe,tmax,tmin,vp"
+# Default location of the raw single-pixel responses (gzipped), keyed by location and period
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'geoEpic', 'daymet')
+TIMEOUT = 120
+
+_session = None
+_session_pid = None
+
+
+def daymet_session():
     """
-    Fetches Daymet weather data for the specified coordinates and time period.
+    Returns a pooled requests.Session retrying failed requests with exponential backoff.
+    A new session is created in each process, since sessions are not fork safe.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        retry = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                      respect_retry_after_header=True)
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(max_retries=retry, pool_maxsize=32))
+        session.mount('http://', HTTPAdapter(max_retries=retry, pool_maxsize=32))
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+
+class RateLimiter:
+    """
+    Spaces calls to 'wait' at least 1/rate seconds apart, across all threads sharing it.
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next - now
+            self.next = max(now, self.next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _cache_file(cache_dir, lat, lon, start, end):
+    return os.path.join(cache_dir, f'{lat:.6f}_{lon:.6f}_{start}_{end}.csv.gz')
+
+
+def fetch_daymet_raw(lat, lon, start, end, cache_dir = None, limiter = None):
+    """
+    Returns the raw single-pixel response of Daymet for a location and period.
+
+    Args:
+        lat (float): Latitude of the location.
+        lon (float): Longitude of the location.
+        start (str): Start date in YYYY-MM-DD format.
+        end (str): End date in YYYY-MM-DD format.
+        cache_dir (str, optional): Folder of cached responses. A cached response is returned
+            without a request, and new responses are saved there.
+        limiter (RateLimiter, optional): Limits the rate of requests.
+
+    Returns:
+        str: The CSV text of the response.
+    """
+    if cache_dir is not None:
+        path = _cache_file(cache_dir, lat, lon, start, end)
+        if os.path.exists(path):
+            with gzip.open(path, 'rt') as f:
+                return f.read()
+    if limiter is not None:
+        limiter.wait()
+    params = {'lat': lat, 'lon': lon, 'vars': DAYMET_VARS, 'start': start, 'end': end}
+    response = daymet_session().get(DAYMET_URL, params=params, timeout=TIMEOUT)
+    response.raise_for_status()
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written under a temporary name so an interrupted run never leaves a partial response
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}'
+        with gzip.open(tmp, 'wt') as f:
+            f.write(response.text)
+        os.replace(tmp, path)
+    return response.text
+
+
+def _fetch_task(task):
+    fetch_daymet_raw(*task)
+
+
+def download_daymet(lats, lons, start, end, cache_dir = CACHE_DIR, max_workers = 8, rate = None, bar = True):
+    """
+    Downloads the Daymet responses of many locations concurrently into a cache.
+
+    Locations already in the cache are skipped, so an interrupted download resumes where it
+    stopped. Requests share a pooled session with retries and exponential backoff.
+
+    Args:
+        lats (array-like): Latitudes of the locations.
+        lons (array-like): Longitudes of the locations.
+        start (str): Start date in YYYY-MM-DD format.
+        end (str): End date in YYYY-MM-DD format.
+        cache_dir (str): Folder of cached responses.
+        max_workers (int): Number of concurrent requests.
+        rate (float, optional): Maximum number of requests per second.
+        bar (bool): Show a progress bar.
+
+    Returns:
+        list: Indices of the locations that could not be downloaded.
     """
-    # Define the URL
-    url = f"https://daymet.ornl.gov/single-pixel/api/data?lat={lat}&lon={lon}&vars=dayl,prcp,srad,swe,tmax,tmin,vp&start={start}&end={end}"
+    lats, lons = np.asarray(lats, dtype=float).tolist(), np.asarray(lons, dtype=float).tolist()
+    limiter = RateLimiter(rate) if rate else None
+    missing = [i for i, (lat, lon) in enumerate(zip(lats, lons))
+               if not os.path.exists(_cache_file(cache_dir, lat, lon, start, end))]
+    tasks = [(lats[i], lons[i], start, end, cache_dir, limiter) for i in missing]
+    _, failed = parallel_executor(_fetch_task, tasks, method='Thread', max_workers=max_workers,
+                                  return_value=False, bar=bar)
+    return [missing[i] for i in failed]
+
 
-    # Get response and raise an exception for HTTP errors
-    response = requests.get(url)
-    response.raise_for_status()  
+def daymet_calendar(years, ydays, values):
+    """
+    Converts Daymet's 365-day years to calendar days, for a single location or a stack of them.
+
+    In leap years days from the 60th on are moved one day later, and a Feb 29 is inserted with
+    the mean of Feb 28 and Mar 1 (missing values if the period stops before Mar 1).
+
+    Args:
+        years (np.ndarray): Year of each Daymet day.
+        ydays (np.ndarray): Day of year (1 to 365) of each Daymet day.
+        values (dict): Arrays of variables with the days along the last axis.
+
+    Returns:
+        tuple: (years, months, days, values, order) over the calendar days in date order, where
+            'order' gives the position of each day among the Daymet days followed by the inserted days.
+    """
+    years, ydays = np.asarray(years, dtype=np.int64), np.asarray(ydays, dtype=np.int64)
+    leap = (years % 4 == 0) & (years % 100 != 0) | (years % 400 == 0)
+    ydays = ydays + (leap & (ydays >= 60))
+    # Pair each leap year's Feb 28 with its Mar 1, if any
+    feb28, mar1 = np.flatnonzero(leap & (ydays == 59)), np.flatnonzero(leap & (ydays == 61))
+    pos = np.searchsorted(years[mar1], years[feb28])
+    paired = pos < len(mar1)
+    paired[paired] = years[mar1[pos[paired]]] == years[feb28[paired]]
 
-    # Convert response content to StringIO for compatibility with pandas read_csv
-    data_content = StringIO(response.text)
+    all_years = np.concatenate([years, years[feb28]])
+    all_ydays = np.concatenate([ydays, np.full(len(feb28), 60)])
+    order = np.lexsort((all_ydays, all_years))
+    dates = (all_years[order] - 1970).astype('datetime64[Y]') + (all_ydays[order] - 1).astype('timedelta64[D]')
+    first = dates.astype('datetime64[M]')
+    months = first.astype(np.int64) % 12 + 1
+    days = (dates - first).astype(np.int64) + 1
+
+    out = {}
+    for name, value in values.items():
+        value = np.asarray(value, dtype=float)
+        if len(feb28):
+            after = np.full(value.shape[:-1] + (len(feb28),), np.nan)
+            after[..., paired] = value[..., mar1[pos[paired]]]
+            value = np.concatenate([value, (value[..., feb28] + after) / 2], axis=-1)
+        out[name] = value[..., order]
+    return all_years[order], months, days, out, order
+
+
+def daymet_units(values):
+    """
+    Returns DLY columns 'srad' (MJ/m2/day), 'tmax', 'tmin', 'prcp' and 'rh' from Daymet variables
+    'dayl', 'srad' (W/m2), 'tmax', 'tmin', 'prcp' and 'vp'.
+    """
+    return {'srad': values['srad'] * values['dayl'] / 1e6,
+            'tmax': values['tmax'], 'tmin': values['tmin'], 'prcp': values['prcp'],
+            'rh': rh_vappr(values['vp'], values['tmax'], values['tmin'])}
+
+
+def get_daymet_data(lat: float, lon: float, start: str, end: str, cache_dir = None):
+    """
+    Fetches Daymet weather data for the specified coordinates and time period.
+    """
+    data_content = StringIO(fetch_daymet_raw(lat, lon, start, end, cache_dir))
 
     # Read and format the data
     data = pd.read_csv(data_content, skiprows=7, names=['year','yday','dayl','prcp','srad','swe','tmax','tmin','vp'])
-    # data.drop(columns=['swe'], inplace=True)
-
-    # get leap year between start and end years and add a column for 60th day
-    start_year = int(start.split('-')[0])
-    end_year = int(end.split('-')[0])
-    years = np.arange(start_year, end_year+1, dtype=np.int64)
-    leap_years = years[np.where((years % 4 == 0) & (years % 100 != 0) | (years % 400 == 0))]
-
-    # add 1 to 'yday' for ydays >= 60 for leap years
-    data.loc[(data['year'].isin(leap_years)) & (data['yday'] >= 60), 'yday'] += 1
-    # get data for 59th and 61st days for leap years and average them
-    day_59 = data[(data['year'].isin(leap_years)) & (data['yday'] == 59)].copy().reset_index(drop=True)
-    day_61 = data[(data['year'].isin(leap_years)) & (data['yday'] == 61)].copy().reset_index(drop=True)
-    avg_leap_days = (day_59 + day_61) / 2
-    avg_leap_days['year'] = day_59['year']
-    avg_leap_days['yday'] = 60  
-
-    data = pd.concat([data, avg_leap_days]).sort_values(['year', 'yday'])
-
-    # Convert the 'yday' column to datetime, and extract month and day
-    data['date'] = pd.to_datetime(data['year'].astype(str) + '-' + data['yday'].astype(str), format='%Y-%j')
-    data['month'] = data['date'].dt.month
-    data['day'] = data['date'].dt.day
-    # Drop the 'date' and 'yday' columns
-    data.drop(['date', 'yday'], axis = 1, inplace=True)
-
-    data['srad'] =  (data['srad'] * data['dayl']) / 1e6  # Convert W/m2 to MJ/m2/day
-    data['rh'] = rh_vappr(data['vp'], data['tmax'], data['tmin'])
-    data = data[['year', 'month', 'day', 'srad', 'tmax', 'tmin', 'prcp', 'rh']]
 
+    variables = {col: data[col].values for col in ['dayl', 'prcp', 'srad', 'tmax', 'tmin', 'vp']}
+    years, months, days, values, order = daymet_calendar(data['year'].values, data['yday'].values, variables)
+    # Rows keep the labels they had before: read rows, then inserted Feb 29s numbered from 0
+    index = np.concatenate([np.arange(len(data)), np.arange(len(order) - len(data))])[order] \
+        if len(order) > len(data) else data.index
+    data = pd.DataFrame({'year': years, 'month': months.astype(np.int32), 'day': days.astype(np.int32)}, index=index)
+    for col, value in daymet_units(values).items():
+        data[col] = value
     return data
 
 # Test the function
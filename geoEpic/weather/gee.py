@@ -28,13 +28,13 @@ def fetch_data(config_file, input_data, output_path):
     # Example print to simulate output file path
     print(f"Data will be saved to: {output_path}")
 
-def main():
+def main(argv = None):
     parser = argparse.ArgumentParser(description="Fetch and output data from GEE")
     parser.add_argument('config_file', help='Path to the configuration file')
     parser.add_argument('--fetch', metavar=('INPUT'), help='Fetch data for latitude and longitude, or a file path')
     parser.add_argument('--out', dest='output_path', help='Output directory or file path for the fetched data')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if args.fetch and args.output_path:
         fetch_data(args.config_file, args.fetch, args.output_path)
@@ -1,40 +1,40 @@
 import os
 import pandas as pd
 from .daymet import *
+from .wind_store import WindCache
 from geoEpic.io import DLY
-from geoEpic.utils import GeoInterface
     
 class DailyWeather:
-    def __init__(self, path, start_date, end_date, offline = False):
+    def __init__(self, path, start_date, end_date, offline = False, wind_cache_size = 256, daymet_cache = None):
         self.path = path
         self.start_date = start_date
         self.end_date = end_date
         self.offline = offline
+        self.daymet_cache = daymet_cache
+        from geoEpic.utils import GeoInterface
         if not offline:
             self.lookup = GeoInterface(path + '/nldas_grid.csv')
+            self.wind = WindCache(path, self.lookup.df, wind_cache_size)
         else:
             self.lookup = GeoInterface(path + '/climate_grid.tif')
 
+    def nldas_cells(self, lats, lons):
+        """Returns the index of the NLDAS cell nearest to each point, to group points sharing wind data."""
+        return self.lookup.find_nearest(lats, lons).index.values
+
+    def wind_speed(self, lat, lon, days):
+        """Returns the NLDAS wind speed nearest to a point on each of 'days' (datetime64[D])."""
+        return self.wind.align(self.lookup.lookup(lat, lon).name, days)
+
     def get(self, lat, lon):
         if not self.offline:
             # nldas_id = int(self.lookup.lookup(lat, lon))
             # nldas_id = int(self.lookup.lookup(lat, lon)['band_1'].item())
             
-            nldas_pixel = self.lookup.lookup(lat, lon)
-            nldas_lat = int(nldas_pixel['lat']*100)
-            nldas_lon = int(nldas_pixel['lon']*100)
-            nldas_id = f'{nldas_lat}a{nldas_lon}'
-            data = get_daymet_data(lat, lon, self.start_date, self.end_date)
-            data['date'] = pd.to_datetime(data[['year', 'month', 'day']])
-            ws = pd.read_csv(self.path + f'/NLDAS_csv/{nldas_id}.csv',header=None)
-            ws.columns = ['date', 'ws']
-            ws['date'] = pd.to_datetime(ws['date'])
-            data['date'] = pd.to_datetime(data[['year', 'month', 'day']])
-            data = pd.merge(data, ws, on='date', how='left', suffixes=('', '_new'))
-            data['ws'] = data['ws'].fillna(3.5)
-            data.sort_values('date', inplace=True)
-            data.drop('date', axis=1, inplace=True)
+            data = get_daymet_data(lat, lon, self.start_date, self.end_date, self.daymet_cache).reset_index(drop=True)
+            days = pd.to_datetime(data[['year', 'month', 'day']]).values.astype('datetime64[D]')
+            data['ws'] = self.wind_speed(lat, lon, days)
             return DLY(data)
         else:
-            daymet_id = int(self.lookup.lookup(lat, lon))
+            daymet_id = int(self.lookup.lookup_many([lat], [lon])[0])
             return DLY.load(self.path + f'/Daily/{daymet_id}')
@@ -6,6 +6,7 @@ import pandas as pd
 from pydap.cas.urs import setup_session
 from geoEpic.utils import parallel_executor
 from geoEpic.utils.formule import windspd
+from geoEpic.weather.wind_store import daily_array, write_series
 from tqdm import tqdm
 import argparse
 from geoEpic.io import ConfigParser
@@ -117,24 +118,14 @@ parallel_executor(download_func, dates, max_workers = max_workers, return_value
 print('Writing windspeed data to CSV...')
 os.makedirs('NLDAS_csv', exist_ok = True)
 
-# For each date, load the data and write to CSV
-for date in tqdm(dates):
-    date_str = date.strftime('%Y-%m')
-    ws = np.load(f'NLDAS_data/{date_str}.npy')
-    days, h, w = ws.shape
-    ws = ws.reshape(days, -1)
-    
-    # Function to write data to CSV
-    def write_func(i):
-        df = pd.DataFrame({'dates': pd.date_range(start = f'{date_str}-01', end = f'{date_str}-{days}', freq='D'),
-                            'values': ws[:, i].flatten()})
-        df.to_csv(f'NLDAS_csv/{i}.csv', mode='a', header=False, index=False)
-    
-    # Use parallel execution to write data to CSV for all grid points
-    parallel_executor(write_func, range(h*w), max_workers=max_workers, return_value = False,bar=False)
-
-
-
-    
-    
-    
+# Stack the months into a (days x cells) array and write each cell's series once
+month_files = [f"NLDAS_data/{date.strftime('%Y-%m')}.npy" for date in dates]
+n_days = sum(np.load(f, mmap_mode = 'r').shape[0] for f in month_files)
+ws = daily_array(n_days, h * w, 'NLDAS_data/stack.npy')
+day = 0
+for f in tqdm(month_files):
+    month = np.load(f)
+    ws[day:day + len(month)] = month.reshape(len(month), -1)
+    day += len(month)
+days = pd.date_range(start = f'{dates[0].strftime("%Y-%m")}-01', periods = n_days, freq = 'D')
+write_series(ws, days, list(range(h * w)), 'NLDAS_csv', max_workers = int(max_workers))
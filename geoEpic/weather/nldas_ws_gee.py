@@ -10,58 +10,22 @@ from datetime import datetime, timedelta
 from geoEpic.io import DataLogger
 from geoEpic.gee.initialize import ee_Initialize
 from geoEpic.utils.workerpool import WorkerPool
+from geoEpic.weather.wind_store import daily_array, write_series
 import shutil
 import time
+from functools import lru_cache
 from tqdm import tqdm
 
-# Parse command line arguments
-parser = argparse.ArgumentParser(description="NLDAS Script with Arguments")
-parser.add_argument("-c", "--config", default= "./config.yml", help="Path to the configuration file")
-parser.add_argument("-w", "--max_workers", default = 4, help = "No. of maximum workers")
-args = parser.parse_args()
-
-config = ConfigParser(args.config)
-max_workers = args.max_workers
-weather = config["weather"]
-aoi = config["Area_of_Interest"]
-start_date = weather["start_date"]
-end_date = weather["end_date"]
-working_dir = weather["dir"]
-
-# Change working dir
-os.makedirs(working_dir, exist_ok = True)
-os.chdir(working_dir)
-
-# Access values using args.bbox
-if aoi.endswith('.shp'):
-    gdf = gpd.read_file(aoi)
-    gdf = gdf.to_crs(epsg=4326)
-    lon_min, lat_min, lon_max, lat_max = gdf.total_bounds
-elif aoi.endswith('.csv'):
-    gdf = pd.read_csv(aoi)
-    lon_min, lat_min = np.floor(gdf['x'].min() * 1e5)/1e5, np.floor(gdf['y'].min() * 1e5)/1e5
-    lon_max, lat_max = np.ceil(gdf['x'].max() * 1e5)/1e5, np.ceil(gdf['y'].max() * 1e5)/1e5
-
-bbox = ee.Geometry.BBox(lon_min, lat_min, lon_max, lat_max)
-
-sql_cache = os.path.join(working_dir,'.cache')
-os.makedirs(sql_cache,exist_ok=True)
-
-nldas_data_path = os.path.join(working_dir,'NLDAS_data')
-os.makedirs(nldas_data_path,exist_ok=True)
-
-nldas_csv_path = os.path.join(working_dir,'NLDAS_csv')
-if os.path.isdir(nldas_csv_path):
-    shutil.rmtree(nldas_csv_path)
-os.makedirs(nldas_csv_path,exist_ok=True)
-
-data_logger = DataLogger(backend="sql",output_folder=sql_cache)
-
-project_name = ee_Initialize()
-pool = WorkerPool(f'gee_global_lock_{project_name}') 
-pool.open(40)
-
-def get_pixels_data(date):
+@lru_cache(maxsize=None)
+def gee_pool():
+    # Initialised once in each worker process, which spawned workers (macOS, Windows) need
+    project_name = ee_Initialize()
+    return WorkerPool(f'gee_global_lock_{project_name}')
+
+def get_pixels_data(task):
+    date, bounds, nldas_data_path = task
+    bbox = ee.Geometry.BBox(*bounds)
+    pool = gee_pool()
     
     date_str = date.strftime('%Y-%m-%d')
     start_date = ee.Date(date_str)
@@ -130,39 +94,102 @@ def get_dates_list(start_date, end_date):
     
     return date_list
 
-dates = get_dates_list(start_date, end_date)
-date_strings = {date.strftime('%Y-%m-%d') for date in dates}
-filtered_dates = get_non_downloaded_dates(dates,nldas_data_path)
-print('Downloading NLDAS windspeed...')
-parallel_executor(get_pixels_data, filtered_dates, max_workers = max_workers)
-
-
-failed_dates = get_non_downloaded_dates(dates,nldas_data_path)
-if len(failed_dates)>0:
-    print('Retrying Failed dates...')
-    time.sleep(2)
-    parallel_executor(get_pixels_data, failed_dates, max_workers = max_workers)
-
-print('Writing NLDAS wind speed to csv files...')
-for date in tqdm(dates):
-    date_str = date.strftime('%Y-%m-%d')
-    ws = pd.read_csv(os.path.join(nldas_data_path,f'{date_str}.csv'))
-    
-    # Function to write data to CSV
-    def write_func(ws_data):
-        lat = int(ws_data['lat']*100)
-        lon = int(ws_data['lon']*100)
-        name = f'{lat}a{lon}'
-        df = pd.DataFrame([{'date': date_str,
-                            'wind_speed': round(ws_data['wind_speed'],2)}])
-        df.to_csv(os.path.join(nldas_csv_path,f'{name}.csv'), mode='a', header=False, index=False)
-    
-    date_ws = ws.to_dict(orient='records')
-    
-    parallel_executor(write_func, date_ws, max_workers=max_workers, return_value = False,bar=False)
-    
-date_str = dates[0].strftime('%Y-%m-%d')
-ws_loc = pd.read_csv(os.path.join(nldas_data_path,f'{date_str}.csv'))
-ws_loc = ws_loc.drop(columns=['wind_speed'])
-ws_loc.to_csv(os.path.join(working_dir,'nldas_grid.csv'),index=False)
-    
\ No newline at end of file
+def transpose_daily(dates, data_path, csv_path, store_dir = None, max_workers = 4):
+    """
+    Stacks the daily NLDAS samples into a (days x cells) array and writes each cell's series once.
+
+    Args:
+        dates (list): Dates to stack, in order.
+        data_path (str): Folder with the '<date>.csv' samples of each day.
+        csv_path (str): Folder for the per-cell '<lat>a<lon>.csv' files.
+        store_dir (str, optional): Folder for the cell-major store read by DailyWeather.
+        max_workers (int): Number of threads writing the cells.
+
+    Returns:
+        pd.DataFrame: 'lon' and 'lat' of the cells, in the order of the store.
+    """
+    def read_day(date, usecols = None):
+        ws = pd.read_csv(os.path.join(data_path, f'{date.strftime("%Y-%m-%d")}.csv'), usecols=usecols)
+        return ws.drop_duplicates(['lat', 'lon'])
+
+    # Cells sampled on any day, in order of first appearance; days missing a cell are left NaN
+    cells = pd.concat([read_day(date, ['lat', 'lon']) for date in dates])
+    cells = cells.drop_duplicates()[['lon', 'lat']].reset_index(drop=True)
+    key = pd.MultiIndex.from_frame(cells[['lat', 'lon']])
+    values = daily_array(len(dates), len(cells), os.path.join(data_path, 'stack.npy'))
+    for i, date in enumerate(tqdm(dates)):
+        values[i] = read_day(date).set_index(['lat', 'lon'])['wind_speed'].reindex(key).values
+
+    names = [f'{int(lat*100)}a{int(lon*100)}' for lat, lon in zip(cells['lat'], cells['lon'])]
+    write_series(values, dates, names, csv_path, store_dir, decimals=2, max_workers=max_workers)
+    if isinstance(values, np.memmap):
+        del values
+        os.remove(os.path.join(data_path, 'stack.npy'))
+    return cells
+
+def main(argv = None):
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="NLDAS Script with Arguments")
+    parser.add_argument("-c", "--config", default= "./config.yml", help="Path to the configuration file")
+    parser.add_argument("-w", "--max_workers", default = 4, help = "No. of maximum workers")
+    args = parser.parse_args(argv)
+
+    config = ConfigParser(args.config)
+    max_workers = args.max_workers
+    weather = config["weather"]
+    aoi = config["Area_of_Interest"]
+    start_date = weather["start_date"]
+    end_date = weather["end_date"]
+    working_dir = weather["dir"]
+
+    # Change working dir
+    os.makedirs(working_dir, exist_ok = True)
+    os.chdir(working_dir)
+
+    # Access values using args.bbox
+    if aoi.endswith('.shp'):
+        gdf = gpd.read_file(aoi)
+        gdf = gdf.to_crs(epsg=4326)
+        lon_min, lat_min, lon_max, lat_max = gdf.total_bounds
+    elif aoi.endswith('.csv'):
+        gdf = pd.read_csv(aoi)
+        lon_min, lat_min = np.floor(gdf['x'].min() * 1e5)/1e5, np.floor(gdf['y'].min() * 1e5)/1e5
+        lon_max, lat_max = np.ceil(gdf['x'].max() * 1e5)/1e5, np.ceil(gdf['y'].max() * 1e5)/1e5
+
+    sql_cache = os.path.join(working_dir,'.cache')
+    os.makedirs(sql_cache,exist_ok=True)
+
+    nldas_data_path = os.path.join(working_dir,'NLDAS_data')
+    os.makedirs(nldas_data_path,exist_ok=True)
+
+    nldas_csv_path = os.path.join(working_dir,'NLDAS_csv')
+    if os.path.isdir(nldas_csv_path):
+        shutil.rmtree(nldas_csv_path)
+    os.makedirs(nldas_csv_path,exist_ok=True)
+
+    data_logger = DataLogger(backend="sql",output_folder=sql_cache)
+
+    pool = gee_pool()
+    pool.open(40)
+    bounds = (lon_min, lat_min, lon_max, lat_max)
+
+    dates = get_dates_list(start_date, end_date)
+    date_strings = {date.strftime('%Y-%m-%d') for date in dates}
+    filtered_dates = get_non_downloaded_dates(dates,nldas_data_path)
+    print('Downloading NLDAS windspeed...')
+    parallel_executor(get_pixels_data, [(date, bounds, nldas_data_path) for date in filtered_dates], max_workers = max_workers)
+
+
+    failed_dates = get_non_downloaded_dates(dates,nldas_data_path)
+    if len(failed_dates)>0:
+        print('Retrying Failed dates...')
+        time.sleep(2)
+        parallel_executor(get_pixels_data, [(date, bounds, nldas_data_path) for date in failed_dates], max_workers = max_workers)
+
+    print('Writing NLDAS wind speed to csv files...')
+    nldas_store = os.path.join(working_dir,'NLDAS_store')
+    ws_loc = transpose_daily(dates, nldas_data_path, nldas_csv_path, nldas_store, max_workers = int(max_workers))
+    ws_loc.to_csv(os.path.join(working_dir,'nldas_grid.csv'),index=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import os
+import re
+import argparse
+import numpy as np
+import pandas as pd
+from geoEpic.io import DLY
+from geoEpic.utils import parallel_executor
+from geoEpic.weather.daymet import daymet_calendar, daymet_units
+
+
+class TileWeather:
+    """
+    Daily weather of many locations read from local Daymet or gridMET NetCDF files.
+
+    Files are found recursively in a folder and matched to variables by name, e.g.
+    'daymet_v4_daily_na_tmax_2000.nc' or '11738_2000/tmax.nc' for Daymet and 'tmmx_2000.nc'
+    for gridMET. Each variable is opened lazily with xarray/dask, and locations are read in
+    batches covering a small window of the grid, so only the chunks under it are loaded.
+    """
+    variables = {'daymet': ['dayl', 'prcp', 'srad', 'tmax', 'tmin', 'vp'],
+                 'gridmet': ['tmmx', 'tmmn', 'pr', 'srad', 'vs', 'rmax', 'rmin']}
+
+    def __init__(self, tile_dir, source = 'daymet'):
+        if source not in self.variables:
+            raise ValueError(f"Unknown source '{source}', expected one of {list(self.variables)}")
+        self.tile_dir = tile_dir
+        self.source = source
+        self.arrays = {}
+        self.lat, self.lon = None, None
+
+    def _files(self, var):
+        """Returns the NetCDF files of 'var' in the tile folder."""
+        pattern = re.compile(rf'(^|[_./-]){var}([_.-]|$)')
+        files = []
+        for root, _, names in os.walk(self.tile_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith(('.nc', '.nc4')) and pattern.search(os.path.relpath(path, self.tile_dir)):
+                    files.append(path)
+        if not files:
+            raise FileNotFoundError(f"No NetCDF files for '{var}' in {self.tile_dir}")
+        return sorted(files)
+
+    def open(self, var):
+        """Returns 'var' as a lazy (time, y, x) DataArray over all of its files."""
+        if var not in self.arrays:
+            import xarray as xr
+            ds = xr.open_mfdataset(self._files(var), combine='by_coords', chunks={})
+            name = var if var in ds.data_vars else [v for v in ds.data_vars if ds[v].ndim == 3][0]
+            array = ds[name]
+            time_dim = array.dims[0]
+            self.arrays[var] = array.rename({time_dim: 'time'}) if time_dim != 'time' else array
+        return self.arrays[var]
+
+    def _coords(self):
+        """Loads (once) the latitude and longitude of the grid as arrays of its shape."""
+        if self.lat is None:
+            array = self.open(self.variables[self.source][0])
+            lat, lon = array['lat'].values, array['lon'].values
+            if lat.ndim == 1:
+                lon, lat = np.meshgrid(lon, lat)
+            self.lat, self.lon = lat, lon
+        return self.lat, self.lon
+
+    def pixels(self, lats, lons, margin = 0.1):
+        """
+        Finds the pixel nearest to each location.
+
+        Args:
+            lats (array-like): Latitudes of the locations.
+            lons (array-like): Longitudes of the locations.
+            margin (float): Degrees around the locations searched for pixels.
+
+        Returns:
+            tuple: (rows, cols) of the nearest pixels.
+        """
+        from geoEpic.utils import GeoInterface
+        lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+        lat, lon = self._coords()
+        near = (lat >= lats.min() - margin) & (lat <= lats.max() + margin) & \
+               (lon >= lons.min() - margin) & (lon <= lons.max() + margin)
+        flat = np.flatnonzero(near)
+        if not len(flat):
+            raise ValueError("Locations are outside of the weather tiles")
+        pixels = pd.DataFrame({'lat': lat.ravel()[flat], 'lon': lon.ravel()[flat], 'pixel': flat})
+        nearest = GeoInterface(pixels).lookup_many(lats, lons, 'pixel')
+        return np.divmod(nearest, lat.shape[1])
+
+    def read(self, lats, lons, start, end):
+        """
+        Reads the daily weather of many locations at once.
+
+        Args:
+            lats (array-like): Latitudes of the locations.
+            lons (array-like): Longitudes of the locations.
+            start (str): Start date in YYYY-MM-DD format.
+            end (str): End date in YYYY-MM-DD format.
+
+        Returns:
+            tuple: (years, months, days, values) where 'values' maps the DLY columns 'srad',
+                'tmax', 'tmin', 'prcp', 'rh' (and 'ws' for gridMET) to (locations x days) arrays.
+        """
+        import xarray as xr
+        rows, cols = self.pixels(lats, lons)
+        # Read the window covering the locations, then pick their pixels
+        r0, r1, c0, c1 = rows.min(), rows.max() + 1, cols.min(), cols.max() + 1
+        pixel, index = np.unique((rows - r0) * (c1 - c0) + (cols - c0), return_inverse=True)
+        pr, pc = np.divmod(pixel, c1 - c0)
+
+        raw, time = {}, None
+        for var in self.variables[self.source]:
+            array = self.open(var)
+            ydim, xdim = array.dims[1:]
+            window = array.sel(time=slice(start, end)).isel({ydim: slice(r0, r1), xdim: slice(c0, c1)})
+            points = window.isel({ydim: xr.DataArray(pr, dims='cell'), xdim: xr.DataArray(pc, dims='cell')})
+            raw[var] = points.transpose('cell', 'time').values[index].astype(float)
+            time = pd.DatetimeIndex(window['time'].values)
+
+        if self.source == 'daymet':
+            # Daymet keeps Feb 29 and drops Dec 31 of leap years, so day of year runs 1 to 365 as 'yday' of the API
+            years, ydays = time.year.values, time.dayofyear.values
+            years, months, days, raw, _ = daymet_calendar(years, ydays, raw)
+            return years, months, days, daymet_units(raw)
+
+        values = {'srad': raw['srad'] * 0.0864,  # W/m2 daily mean to MJ/m2/day
+                  'tmax': raw['tmmx'] - 273.15, 'tmin': raw['tmmn'] - 273.15, 'prcp': raw['pr'],
+                  'rh': (raw['rmax'] + raw['rmin']) / 200, 'ws': raw['vs']}
+        return time.year.values, time.month.values, time.day.values, values
+
+    def write_dly(self, cells, out_dir, start, end, wind = None, monthly_dir = None,
+                  batch_size = 500, max_workers = 8):
+        """
+        Writes the DLY files of many cells from the tiles.
+
+        Args:
+            cells (pd.DataFrame): Cells with 'lat', 'lon' and 'dly' (the DLY file id).
+            out_dir (str): Folder of the DLY files.
+            start (str): Start date in YYYY-MM-DD format.
+            end (str): End date in YYYY-MM-DD format.
+            wind (callable, optional): Called with the cell's lat, lon and the days as
+                datetime64[D], returns its wind speed. Defaults to gridMET wind, or 3.5.
+            monthly_dir (str, optional): Folder of monthly files written with each DLY.
+            batch_size (int): Number of cells read at once. Cells with consecutive ids of a
+                row-major grid such as climate_grid.tif cover a small window of the tiles.
+            max_workers (int): Number of processes writing the files.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        if monthly_dir is not None: os.makedirs(monthly_dir, exist_ok=True)
+        cells = cells.sort_values('dly')
+        for i in range(0, len(cells), batch_size):
+            batch = cells.iloc[i:i + batch_size]
+            years, months, days, values = self.read(batch['lat'], batch['lon'], start, end)
+            dates = pd.to_datetime(pd.DataFrame({'year': years, 'month': months, 'day': days})).values.astype('datetime64[D]')
+            tasks = []
+            for j, (lat, lon, dly) in enumerate(zip(batch['lat'], batch['lon'], batch['dly'])):
+                data = pd.DataFrame({'year': years, 'month': months, 'day': days})
+                for column in ('srad', 'tmax', 'tmin', 'prcp', 'rh'):
+                    data[column] = values[column][j]
+                if wind is not None:
+                    data['ws'] = wind(lat, lon, dates)
+                else:
+                    data['ws'] = values['ws'][j] if 'ws' in values else 3.5
+                monthly = os.path.join(monthly_dir, str(int(dly))) if monthly_dir is not None else None
+                tasks.append((data, os.path.join(out_dir, str(int(dly))), monthly))
+            parallel_executor(_save_dly, tasks, max_workers=max_workers, bar=False)
+
+
+def _save_dly(task):
+    data, path, monthly = task
+    dly = DLY(data)
+    dly.save(path)
+    if monthly is not None:
+        dly.to_monthly(monthly)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Writes DLY files of climate cells from local NetCDF tiles")
+    parser.add_argument("-t", "--tiles", required=True, help="Folder of Daymet or gridMET NetCDF files")
+    parser.add_argument("-g", "--grid", default="./climate_grid.tif", help="Raster of climate cell ids")
+    parser.add_argument("-s", "--start", required=True, help="Start date (YYYY-MM-DD)")
+    parser.add_argument("-e", "--end", required=True, help="End date (YYYY-MM-DD)")
+    parser.add_argument("-o", "--output", default="./Daily", help="Folder of the DLY files")
+    parser.add_argument("--source", default="daymet", choices=list(TileWeather.variables), help="Source of the tiles")
+    parser.add_argument("-b", "--batch_size", type=int, default=500, help="Number of cells read at once")
+    parser.add_argument("-w", "--max_workers", type=int, default=8, help="No. of maximum workers")
+    args = parser.parse_args(argv)
+
+    from geoEpic.utils import raster_to_dataframe
+    cells = raster_to_dataframe(args.grid).dropna()
+    cells = cells.rename(columns={cells.columns[2]: 'dly'})
+    TileWeather(args.tiles, args.source).write_dly(cells, args.output, args.start, args.end,
+                                                   batch_size=args.batch_size, max_workers=args.max_workers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import os
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from geoEpic.utils import parallel_executor
+
+
+def daily_array(n_days, n_cells, path = None, max_memory = 2**30):
+    """
+    Allocates a (days x cells) array to stack daily grids in.
+
+    Args:
+        n_days (int): Number of days.
+        n_cells (int): Number of grid cells.
+        path (str, optional): File backing the array when it is larger than 'max_memory'.
+        max_memory (int): Largest array, in bytes, kept in memory.
+
+    Returns:
+        np.ndarray: Array filled with NaN, memory-mapped to 'path' if it is too large.
+    """
+    shape = (n_days, n_cells)
+    if path is not None and n_days * n_cells * 8 > max_memory:
+        values = np.lib.format.open_memmap(path, mode='w+', dtype='float64', shape=shape)
+    else:
+        values = np.empty(shape, dtype='float64')
+    values[:] = np.nan
+    return values
+
+
+def _write_block(task):
+    values, dates, names, csv_dir, store, start, decimals = task
+    block = (values if decimals is None else np.round(values, decimals)).T
+    if store is not None:
+        store[start:start + len(block)] = block
+    if csv_dir is None:
+        return
+    for name, series in zip(names, block):
+        valid = ~np.isnan(series)
+        text = series[valid].astype(str) if decimals is None else np.char.mod(f'%.{decimals}f', series[valid])
+        lines = np.char.add(dates[valid], text)
+        with open(os.path.join(csv_dir, f'{name}.csv'), 'w') as f:
+            f.write('\n'.join(lines) + '\n' if len(lines) else '')
+
+
+def write_series(values, dates, names, csv_dir = None, store_dir = None, decimals = None, chunk_size = 256, max_workers = 4):
+    """
+    Writes the series of every cell of a (days x cells) array in one pass.
+
+    Each cell is written once, as '<csv_dir>/<name>.csv' with 'date,value' rows (days with
+    missing values are left out), and/or as a row of the cell-major store in 'store_dir'
+    read by 'read_series'.
+
+    Args:
+        values (np.ndarray): Daily values with one row per day and one column per cell.
+        dates (array-like): Dates of the rows.
+        names (list): File name of each cell's CSV.
+        csv_dir (str, optional): Folder for the per-cell CSV files.
+        store_dir (str, optional): Folder for the store.
+        decimals (int, optional): Decimals the values are rounded to. Defaults to full precision.
+        chunk_size (int): Number of cells transposed and written by each task.
+        max_workers (int): Number of threads writing the blocks.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    n_days, n_cells = values.shape
+    store = None
+    if store_dir is not None:
+        os.makedirs(store_dir, exist_ok=True)
+        np.save(os.path.join(store_dir, 'dates.npy'), dates)
+        store = np.lib.format.open_memmap(os.path.join(store_dir, 'values.npy'), mode='w+',
+                                          dtype='float64', shape=(n_cells, n_days))
+    date_strs = np.char.add(dates.astype(str), ',')
+    tasks = [(values[:, i:i + chunk_size], date_strs, names[i:i + chunk_size], csv_dir, store, i, decimals)
+             for i in range(0, n_cells, chunk_size)]
+    parallel_executor(_write_block, tasks, method='Thread', max_workers=max_workers,
+                      return_value=False, bar=False)
+    if store is not None:
+        store.flush()
+
+
+def read_series(store_dir, index):
+    """
+    Reads the series of one cell from a store written by 'write_series'.
+
+    Args:
+        store_dir (str): Folder of the store.
+        index (int): Position of the cell in the columns of the stacked array.
+
+    Returns:
+        tuple: (dates, values) as numpy arrays, with NaN on missing days.
+    """
+    dates = np.load(os.path.join(store_dir, 'dates.npy'))
+    values = np.load(os.path.join(store_dir, 'values.npy'), mmap_mode='r')
+    return dates, np.array(values[index])
+
+
+class WindCache:
+    """
+    In-memory LRU of per-cell wind speed series, indexed by day offset.
+
+    Series are read from the NLDAS store in 'path' if it exists, otherwise from the
+    per-cell CSV files, once per cell while they stay among the 'maxsize' most recently used.
+    """
+    def __init__(self, path, cells, maxsize = 256):
+        """
+        Args:
+            path (str): Weather folder with 'NLDAS_store' or 'NLDAS_csv'.
+            cells (pd.DataFrame): Rows of 'nldas_grid.csv', whose index identifies the cells.
+            maxsize (int): Number of series kept in memory.
+        """
+        self.path = path
+        self.cells = cells
+        self.store = os.path.join(path, 'NLDAS_store')
+        if not os.path.isdir(self.store): self.store = None
+        self.series = lru_cache(maxsize = maxsize)(self._load)
+
+    def _load(self, cell):
+        """Returns (first day, daily values with NaN on missing days) of a cell."""
+        if self.store is not None:
+            dates, values = read_series(self.store, cell)
+            return dates[0], values
+        lat = int(self.cells.at[cell, 'lat']*100)
+        lon = int(self.cells.at[cell, 'lon']*100)
+        ws = pd.read_csv(os.path.join(self.path, 'NLDAS_csv', f'{lat}a{lon}.csv'), header=None)
+        dates = pd.to_datetime(ws[0]).values.astype('datetime64[D]')
+        first = dates.min()
+        values = np.full((dates.max() - first).astype(int) + 1, np.nan)
+        values[(dates - first).astype(int)] = ws[1].values
+        return first, values
+
+    def align(self, cell, days, fill = 3.5):
+        """
+        Returns the wind speed of a cell on each of 'days', with 'fill' where it is missing.
+
+        Args:
+            cell: Index of the cell in 'cells'.
+            days (np.ndarray): Dates as datetime64[D].
+            fill (float): Value for days without data.
+        """
+        first, values = self.series(cell)
+        offset = (days - first).astype(int)
+        inside = (offset >= 0) & (offset < len(values))
+        ws = np.full(len(days), fill)
+        ws[inside] = values[offset[inside]]
+        ws[np.isnan(ws)] = fill
+        return ws
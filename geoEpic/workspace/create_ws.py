@@ -1,12 +1,12 @@
 import os
-from parallel_copy import copy_mapped_files
+from geoEpic.workspace.parallel_copy import copy_mapped_files
 import argparse
 
 
-def main():
+def main(argv = None):
     parser = argparse.ArgumentParser(description="Create Workspace for EPIC package")
     parser.add_argument('-n', '--workspace_name', required=True, help='Directory where workspace will be created')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     copy_mapped_files('ws_template', args.workspace_name, 5)
 
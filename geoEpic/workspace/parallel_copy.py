@@ -75,7 +75,7 @@ def copy_mapped_files(key, destination, max_workers):
                         method='Thread', max_workers=max_workers, 
                         timeout=20, bar = False)
         
-def main():
+def main(argv = None):
     # Set up argument parsing
     parser = argparse.ArgumentParser(description="Parallel file copy or add utilities to workspace.")
     parser.add_argument("source", help="Path to the source directory or file or a key for file mapping")
@@ -87,7 +87,7 @@ def main():
     parser.add_argument("-np", "--no-progress", action="store_true", help="Do not show a progress bar")
 
     # Parse arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Check if the source is a dir
     if os.path.isdir(args.source):
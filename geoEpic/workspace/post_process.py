@@ -1,52 +1,61 @@
 import os
 import argparse
+from functools import lru_cache, partial
 import pandas as pd
 from geoEpic.io import ConfigParser
 from geoEpic.utils import parallel_executor
 from geoEpic.utils.misc import import_function
 from glob import glob
 
-# Fetch the base directory
-parser = argparse.ArgumentParser(description="EPIC workspace")
-parser.add_argument("-c", "--config", default= "./config.yml", help="Path to the configuration file")
-args = parser.parse_args()
+@lru_cache(maxsize=None)
+def load_function(cmd):
+    # Loaded once in each worker process, since functions loaded from a file path can't be pickled
+    return import_function(cmd)
 
-curr_dir = os.getcwd()
+def wrap(fid, cmd, base_dir):
+    try:
+        load_function(cmd)(fid, base_dir)
+    except FileNotFoundError:
+        pass
 
-config = ConfigParser(args.config)
+def main(argv = None):
+    # Fetch the base directory
+    parser = argparse.ArgumentParser(description="EPIC workspace")
+    parser.add_argument("-c", "--config", default= "./config.yml", help="Path to the configuration file")
+    args = parser.parse_args(argv)
 
-base_dir = curr_dir
+    curr_dir = os.getcwd()
 
-process_outputs = import_function(config["Process_outputs"])
+    config = ConfigParser(args.config)
 
-output_dir = config['output_dir']
-if output_dir is None:
-    raise ValueError("Output directory not specified in configuration.")
+    base_dir = curr_dir
 
-if not os.path.exists(output_dir):
-    raise Exception(f"Output folder not found: {output_dir}")
-    
+    process_outputs = partial(wrap, cmd = config["Process_outputs"], base_dir = base_dir)
 
-info = pd.read_csv('info.csv')
+    output_dir = config['output_dir']
+    if output_dir is None:
+        raise ValueError("Output directory not specified in configuration.")
 
-opc_files = glob(f'{config["opc_dir"]}/*.OPC')
-present = [(os.path.basename(f).split('.'))[0] for f in opc_files]
-info = info.loc[(info['opc'].astype(str)).isin(present)]
+    if not os.path.exists(output_dir):
+        raise Exception(f"Output folder not found: {output_dir}")
 
-info_ls = list(info['FieldID'])
 
-total = len(info_ls)
-min_ind, max_ind = config["Range"]
-min_ind, max_ind = int(min_ind*total), int(max_ind*total)
-print('Total Field Sites:', max_ind-min_ind)
+    info = pd.read_csv('info.csv')
 
-def wrap(fid):
-    try:
-        process_outputs(fid, base_dir)
-    except FileNotFoundError:
-        pass
+    opc_files = glob(f'{config["opc_dir"]}/*.OPC')
+    present = [(os.path.basename(f).split('.'))[0] for f in opc_files]
+    info = info.loc[(info['opc'].astype(str)).isin(present)]
+
+    info_ls = list(info['FieldID'])
+
+    total = len(info_ls)
+    min_ind, max_ind = config["Range"]
+    min_ind, max_ind = int(min_ind*total), int(max_ind*total)
+    print('Total Field Sites:', max_ind-min_ind)
 
-os.chdir(output_dir)
-wrap(info_ls[min_ind])
-parallel_executor(wrap, info_ls[min_ind: max_ind], max_workers = config["num_of_workers"], timeout = config["timeout"])
+    os.chdir(output_dir)
+    process_outputs(info_ls[min_ind])
+    parallel_executor(process_outputs, info_ls[min_ind: max_ind], max_workers = config["num_of_workers"], timeout = config["timeout"])
 
+if __name__ == '__main__':
+    main()
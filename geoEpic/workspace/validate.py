@@ -81,13 +81,13 @@ def validate_workspace(config_file):
         else:
             print(f"All {filetype} files are present.")
 
-def main():
+def main(argv = None):
     # Set up command-line argument parsing
     parser = argparse.ArgumentParser(description="Validate workspace configuration and files.")
     parser.add_argument("-c", "--config", default= "./config.yml", help="Path to the configuration file")
     
     # Parse arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Validate workspace
     validate_workspace(args.config)
@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pytest
+
+from geoEpic.weather import daymet
+
+START, END = '2004-02-20', '2004-03-10'
+
+
+def _response(lat, lon):
+    """Single-pixel CSV of a location: 6 lines of metadata, the column names and one row per day."""
+    lines = [f'Latitude: {lat}  Longitude: {lon}', 'X & Y on Lambert Conformal Conic: 0 0', 'Tile: 11738',
+             'Elevation: 300 meters', 'All years; all variables; Daymet Software Version 4.0', '',
+             'year,yday,dayl (s),prcp (mm/day),srad (W/m^2),swe (kg/m^2),tmax (deg c),tmin (deg c),vp (Pa)']
+    for yday in range(51, 70):
+        lines.append(f'2004,{yday},40000,{yday % 3},{200 + lat:.2f},0,{10 + yday / 10:.1f},{yday / 10:.1f},800')
+    return '\n'.join(lines) + '\n'
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Daymet single-pixel stand-in, with scripted failures by latitude."""
+    lock = threading.Lock()
+    requests = []
+    # Latitude -> list of statuses returned before answering, or one status returned every time
+    failures = {}
+
+    def do_GET(self):
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        lat, lon = float(query['lat']), float(query['lon'])
+        with self.lock:
+            self.requests.append((lat, time.monotonic()))
+            pending = self.failures.get(lat, [])
+            status = pending if isinstance(pending, int) else (pending.pop(0) if pending else 200)
+        if status != 200:
+            self.send_response(status)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = _response(lat, lon).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    StandIn.requests, StandIn.failures = [], {}
+    monkeypatch.setattr(daymet, 'DAYMET_URL', f'http://127.0.0.1:{httpd.server_port}/single-pixel/api/data')
+    # Same retry policy as the Daymet session, without the backoff
+    monkeypatch.setattr(daymet, '_session', None)
+    session = daymet.daymet_session()
+    for adapter in session.adapters.values():
+        adapter.max_retries = adapter.max_retries.new(backoff_factor=0)
+    yield StandIn
+    httpd.shutdown()
+    httpd.server_close()
+    daymet._session = None
+
+
+def test_download_daymet(server, tmp_path):
+    cache = str(tmp_path / 'daymet')
+    lats = [40.0, 40.1, 40.2, 40.3, 40.4, 40.5]
+    lons = [-95.0] * len(lats)
+    server.failures = {40.0: [503], 40.1: [429, 502], 40.2: 500}
+
+    failed = daymet.download_daymet(lats, lons, START, END, cache, max_workers=4, bar=False)
+
+    # Retried locations are asked again, the failing one until retries run out
+    assert failed == [2]
+    count = lambda lat: sum(r[0] == lat for r in server.requests)
+    assert [count(lat) for lat in lats] == [2, 3, 6, 1, 1, 1]
+    cached = sorted(os.listdir(cache))
+    assert len(cached) == 5 and all(name.endswith('.csv.gz') for name in cached)
+
+    # A rerun only requests the location that is not cached yet
+    server.requests, server.failures = [], {}
+    assert daymet.download_daymet(lats, lons, START, END, cache, max_workers=4, bar=False) == []
+    assert [r[0] for r in server.requests] == [40.2]
+
+    # Cached responses are read without requests, and match the service
+    server.requests = []
+    text = daymet.fetch_daymet_raw(40.1, -95.0, START, END, cache)
+    assert text == _response(40.1, -95.0)
+    dly = daymet.get_daymet_data(40.1, -95.0, START, END, cache)
+    assert server.requests == []
+    assert len(dly) == 20  # 19 Daymet days and the inserted Feb 29
+    assert list(dly['month'].iloc[9:11]) == [2, 3] and dly['day'].iloc[9] == 29
+
+
+def test_download_daymet_rate(server, tmp_path):
+    lats = np.round(40 + np.arange(8) / 10, 1)
+    rate = 20
+    daymet.download_daymet(lats, [-95.0] * len(lats), START, END, str(tmp_path), max_workers=8, rate=rate, bar=False)
+
+    times = np.sort([t for _, t in server.requests])
+    assert len(times) == len(lats)
+    # Requests of concurrent workers are spaced 1/rate seconds apart
+    assert np.all(np.diff(times) > 0.8 / rate)
+
+
+def test_rate_limiter():
+    limiter = daymet.RateLimiter(50)
+    times = []
+    def call():
+        limiter.wait()
+        times.append(time.monotonic())
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert np.all(np.diff(np.sort(times)) > 0.8 / 50)
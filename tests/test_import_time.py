@@ -0,0 +1,33 @@
+import os
+import sys
+import subprocess
+
+from geoEpic.utils.import_time import measure_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds allowed for 'import geoEpic.core', most of it pandas; override with GEOEPIC_IMPORT_BUDGET
+BUDGET = float(os.environ.get('GEOEPIC_IMPORT_BUDGET', 2.0))
+
+# Packages only needed by the soil, weather and GIS tools, not to run simulations
+HEAVY = ['rasterio', 'osgeo', 'geopandas', 'sklearn', 'requests']
+
+
+def _imported(module):
+    """Returns the top-level packages in sys.modules after importing 'module' in a fresh interpreter."""
+    code = f'import sys, {module}; print(" ".join(sorted({{m.split(".")[0] for m in sys.modules}})))'
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=ROOT)
+    assert proc.returncode == 0, proc.stderr
+    return set(proc.stdout.split())
+
+
+def test_core_skips_heavy_imports():
+    loaded = sorted(set(HEAVY) & _imported('geoEpic.core'))
+    assert not loaded, f"'import geoEpic.core' loads {', '.join(loaded)}"
+
+
+def test_core_import_budget(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    seconds, slowest = measure_import('geoEpic.core')
+    assert seconds is not None, slowest
+    assert seconds <= BUDGET, f"'import geoEpic.core' took {seconds:.2f} s, slowest imports: {slowest}"
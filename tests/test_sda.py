@@ -0,0 +1,106 @@
+import re
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import pandas as pd
+
+from geoEpic.soil.sda import SoilDataAccess
+
+COLUMNS = ['mukey', 'cokey', 'chkey', 'musym', 'desgnvert', 'hzdepb_r', 'dbthirdbar_r', 'wfifteenbar_r',
+           'wthirdbar_r', 'sandtotal_r', 'silttotal_r', 'ph1to1h2o_r', 'awc_r', 'sumbases_r', 'om_r',
+           'caco3_r', 'cec7_r', 'sieveno10_r', 'fraggt10_r', 'frag3to10_r', 'dbovendry_r', 'ksat_r',
+           'compname', 'hydgrp', 'comppct_r', 'slope_r', 'slopelenusle_r', 'albedodry_r']
+
+
+def _rows(mukey):
+    """Two horizons of a map unit; map units divisible by 7 have no data."""
+    if mukey % 7 == 0: return []
+    rows = []
+    for layer, depth in ((1, 20), (2, 100)):
+        row = dict.fromkeys(COLUMNS, '1')
+        row.update(mukey=str(mukey), desgnvert=str(layer), hzdepb_r=str(depth), wthirdbar_r=str(mukey % 30 + 10),
+                   sieveno10_r='90', compname='Series', hydgrp='B')
+        rows.append([row[c] for c in COLUMNS])
+    return rows
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Soil Data Access stand-in answering properties queries, with scripted failures by first mukey of a chunk."""
+    lock = threading.Lock()
+    requests = []
+    # First mukey of a chunk -> list of statuses returned before answering, or one status returned every time
+    failures = {}
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        condition = re.search(r'WHERE mukey in \(([^)]*)\)', body['query']).group(1)
+        mukeys = [int(m.strip(" '")) for m in condition.split(',')]
+        with self.lock:
+            self.requests.append(mukeys)
+            pending = self.failures.get(mukeys[0], [])
+            status = pending if isinstance(pending, int) else (pending.pop(0) if pending else 200)
+        if status != 200:
+            self.send_response(status)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        rows = [row for mukey in mukeys for row in _rows(mukey)]
+        data = json.dumps({'Table': [COLUMNS] + rows} if rows else {}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    StandIn.requests, StandIn.failures = [], {}
+    monkeypatch.setattr(SoilDataAccess, 'BASE_URL', f'http://127.0.0.1:{httpd.server_port}/post.rest')
+    # Same retry policy as the service session, without the backoff
+    monkeypatch.setattr(SoilDataAccess, '_session', None)
+    session = SoilDataAccess.session()
+    for adapter in session.adapters.values():
+        adapter.max_retries = adapter.max_retries.new(backoff_factor=0)
+    yield StandIn
+    httpd.shutdown()
+    httpd.server_close()
+    SoilDataAccess._session = None
+
+
+def test_fetch_properties_batch(server, tmp_path):
+    cache = str(tmp_path / 'sda.sqlite')
+    mukeys = list(range(1, 451)) + [5, 10]
+    server.failures = {1: [503], 201: [429, 502], 401: 500}
+
+    soil = SoilDataAccess.fetch_properties_batch(mukeys, cache_path=cache)
+
+    # Chunks of CHUNK_SIZE unique mukeys; retried chunks are asked again, the failing one until retries run out
+    chunks = sorted({tuple(r) for r in server.requests})
+    assert [len(c) for c in chunks] == [200, 200, 50]
+    assert sum(r[0] == 1 for r in server.requests) == 2
+    assert sum(r[0] == 201 for r in server.requests) == 3
+    assert sum(r[0] == 401 for r in server.requests) == 6
+    expected = [m for m in range(1, 401) if m % 7]
+    assert sorted(soil['mukey'].unique()) == expected
+    assert (soil.groupby('mukey').size() == 2).all()
+
+    # A rerun reads the fetched chunks from the cache, including map units without data,
+    # and only requests the chunk that failed
+    server.requests, server.failures = [], {}
+    again = SoilDataAccess.fetch_properties_batch(mukeys, cache_path=cache)
+    assert server.requests == [list(range(401, 451))]
+    assert sorted(again['mukey'].unique()) == [m for m in range(1, 451) if m % 7]
+    pd.testing.assert_frame_equal(again[again['mukey'] < 401].reset_index(drop=True), soil.reset_index(drop=True))
+
+    server.requests = []
+    SoilDataAccess.fetch_properties_batch(mukeys, cache_path=cache)
+    assert server.requests == []
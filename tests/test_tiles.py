@@ -0,0 +1,80 @@
+import gzip
+import numpy as np
+import pandas as pd
+import pytest
+
+xr = pytest.importorskip('xarray')
+pytest.importorskip('dask')
+
+from geoEpic.weather import daymet
+from geoEpic.weather.tiles import TileWeather
+
+VARS = ['dayl', 'prcp', 'srad', 'swe', 'tmax', 'tmin', 'vp']
+H, W = 12, 16
+
+
+def _daymet_dates(year):
+    # Daymet years keep Feb 29 and drop Dec 31 in leap years
+    return pd.date_range(f'{year}-01-01', f'{year}-12-31')[:365]
+
+
+@pytest.fixture(scope='module')
+def tiles(tmp_path_factory):
+    """Two Daymet tiles side by side for 2003 and the leap year 2004."""
+    root = tmp_path_factory.mktemp('tiles')
+    rng = np.random.default_rng(0)
+    x, y = np.arange(W) * 1000., np.arange(H)[::-1] * 1000.
+    X, Y = np.meshgrid(x, y)
+    lat, lon = 40 + Y / 111000, -95 + X / 85000
+    data = {}
+    for year in (2003, 2004):
+        time = _daymet_dates(year)
+        for var in VARS:
+            data[(year, var)] = rng.uniform(1, 30, (365, H, W)).round(2)
+        for k, (c0, c1) in enumerate([(0, W // 2), (W // 2, W)]):
+            folder = root / f'{1100 + k}_{year}'
+            folder.mkdir()
+            for var in VARS:
+                ds = xr.Dataset({var: (('time', 'y', 'x'), data[(year, var)][:, :, c0:c1])},
+                                coords={'time': time, 'y': y, 'x': x[c0:c1],
+                                        'lat': (('y', 'x'), lat[:, c0:c1]), 'lon': (('y', 'x'), lon[:, c0:c1])})
+                ds.to_netcdf(folder / f'{var}.nc')
+    return root, data, lat, lon
+
+
+def _single_pixel(tmp_path, data, r, c, lat, lon, start, end):
+    """Returns get_daymet_data for the series of pixel (r, c), as the single-pixel API would serve it."""
+    rows = []
+    for year in (2003, 2004):
+        for i, date in enumerate(_daymet_dates(year)):
+            if pd.Timestamp(start) <= date <= pd.Timestamp(end):
+                values = [repr(float(data[(year, var)][i, r, c])) for var in VARS]
+                rows.append(','.join([str(year), str(date.dayofyear)] + values))
+    cache = tmp_path / 'cache'
+    cache.mkdir(exist_ok=True)
+    with gzip.open(daymet._cache_file(str(cache), lat, lon, start, end), 'wt') as f:
+        f.write('\n' * 6 + 'header\n' + '\n'.join(rows) + '\n')
+    return daymet.get_daymet_data(lat, lon, start, end, str(cache)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('start, end', [('2003-01-01', '2004-12-31'), ('2004-07-01', '2004-12-31'),
+                                        ('2003-10-15', '2004-03-10')])
+def test_daymet_tiles_match_single_pixel(tmp_path, tiles, start, end):
+    root, data, lat, lon = tiles
+    # Pixels on both sides of the seam between the tiles
+    pixels = [(2, 3), (6, W // 2 - 1), (6, W // 2), (11, W - 1)]
+    lats = [lat[r, c] + 1e-4 for r, c in pixels]
+    lons = [lon[r, c] - 1e-4 for r, c in pixels]
+    years, months, days, values = TileWeather(str(root)).read(lats, lons, start, end)
+    for k, (r, c) in enumerate(pixels):
+        expected = _single_pixel(tmp_path, data, r, c, lats[k], lons[k], start, end)
+        got = pd.DataFrame({'year': years, 'month': months, 'day': days,
+                            **{col: values[col][k] for col in ['srad', 'tmax', 'tmin', 'prcp', 'rh']}})
+        pd.testing.assert_frame_equal(expected, got, check_dtype=False)
+
+
+def test_daymet_tiles_mid_year_dates(tiles):
+    root, _, lat, lon = tiles
+    years, months, days, _ = TileWeather(str(root)).read([lat[0, 0]], [lon[0, 0]], '2004-07-01', '2004-12-31')
+    assert len(years) == 183
+    assert (years == 2004).all() and months[0] == 7 and (months[-1], days[-1]) == (12, 31)